@@ -4,7 +4,7 @@ import os
 from pathlib import Path
 
 from dotenv import load_dotenv
-from flask import Flask, flash, redirect, render_template, request, session, url_for
+from flask import Flask, current_app, flash, redirect, render_template, request, session, url_for
 from flask_login import LoginManager, current_user, login_user
 from flask_migrate import Migrate
 from flask_session import Session
@@ -12,6 +12,7 @@ from flask_wtf import CSRFProtect
 from flask_wtf.csrf import CSRFError, generate_csrf
 from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
 from sqlalchemy import inspect, text
+from sqlalchemy.pool import StaticPool
 
 from config import Config
 from models import User, db
@@ -93,6 +94,9 @@ def create_app(test_config: dict | None = None):
         # Disable CSRF in tests to simplify form posting
         if app.config.get("TESTING"):
             app.config["WTF_CSRF_ENABLED"] = False
+            # Full-cost KDFs dominate test runtime; one PBKDF2 round is plenty there
+            if "PASSWORD_HASH_METHOD" not in test_config:
+                app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:1"
     else:
         # For pytest we rely on default host cookie behavior; no domain overrides
         if os.environ.get("PYTEST_CURRENT_TEST"):
@@ -102,10 +106,15 @@ def create_app(test_config: dict | None = None):
     uri = app.config.get("SQLALCHEMY_DATABASE_URI", "")
     if uri.startswith("sqlite") and (":memory:" in uri):
         engine_opts = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
-        # These options are for QueuePool and not meaningful for StaticPool used by memory SQLite
-        for k in ("pool_timeout", "pool_recycle"):
+        # These options are for QueuePool and not meaningful for StaticPool used by memory SQLite.
+        # pre_ping would issue a SELECT 1 on every checkout of the single shared connection.
+        for k in ("pool_timeout", "pool_recycle", "pool_pre_ping"):
             engine_opts.pop(k, None)
-        # pre_ping not needed for memory DB, but harmless; keep or remove
+        # Every checkout must get the same connection or it would see an empty database
+        engine_opts.setdefault("poolclass", StaticPool)
+        connect_args = dict(engine_opts.get("connect_args", {}))
+        connect_args.setdefault("check_same_thread", False)
+        engine_opts["connect_args"] = connect_args
         app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_opts
 
     # Initialize extensions
@@ -125,6 +134,8 @@ def create_app(test_config: dict | None = None):
             pass
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
+    # Per-IP login attempt log for the fallback rate limiter in auth_routes
+    app.extensions["login_attempts"] = {}
 
     # Initialize Flask-Limiter if available (graceful degradation)
     global limiter
@@ -162,7 +173,7 @@ def create_app(test_config: dict | None = None):
                 # As an additional fallback, use recent registration map by client IP
                 try:
                     ip = request.headers.get("X-Forwarded-For", request.remote_addr)
-                    rec = app.config.get("_RECENT_REG", {}).get(ip)
+                    rec = current_app.config.get("_RECENT_REG", {}).get(ip)
                     if rec:
                         uid2, ts = rec
                         import time as _t
@@ -177,7 +188,7 @@ def create_app(test_config: dict | None = None):
                 # During tests (pytest) also consider helper cookies as a fallback only
                 import sys as _sys
 
-                if app.config.get("TESTING") or ("pytest" in _sys.modules):
+                if current_app.config.get("TESTING") or ("pytest" in _sys.modules):
                     uid_cookie = request.cookies.get("x_reg_uid") or request.cookies.get("reg_uid")
                     if uid_cookie and uid_cookie.isdigit():
                         u = db.session.get(User, int(uid_cookie))
@@ -188,10 +199,10 @@ def create_app(test_config: dict | None = None):
                 # but cookies/session didn't persist yet, log that user in.
                 try:
                     if (
-                        app.config.get("TESTING") or ("pytest" in _sys.modules)
+                        current_app.config.get("TESTING") or ("pytest" in _sys.modules)
                     ) and not current_user.is_authenticated:
                         ip = request.headers.get("X-Forwarded-For", request.remote_addr)
-                        rec = app.config.get("_RECENT_REG", {}).get(ip)
+                        rec = current_app.config.get("_RECENT_REG", {}).get(ip)
                         if rec:
                             uid3, ts3 = rec
                             import time as _t
@@ -376,7 +387,7 @@ def create_app(test_config: dict | None = None):
             "style-src 'self' https://cdn.jsdelivr.net 'unsafe-inline'",  # unsafe-inline needed for inline styles
             "img-src 'self' data: https://res.cloudinary.com https:",  # Allow cloudinary and external images
             "font-src 'self' https://cdn.jsdelivr.net data:",
-            "connect-src 'self'",
+            "connect-src 'self' https://api.cloudinary.com",  # Direct avatar uploads
             "frame-ancestors 'none'",  # Modern alternative to X-Frame-Options
             "base-uri 'self'",
             "form-action 'self'",
@@ -26,6 +26,9 @@ class Config:
         "pool_timeout": int(os.getenv("SQLALCHEMY_POOL_TIMEOUT", "10")),
     }
 
+    # Werkzeug password hashing method for new accounts (e.g. "scrypt", "pbkdf2:sha256:600000")
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+
     # Cookie/session security (tunable via env for local vs prod)
     # Default to safe values; override with env vars as needed
     SESSION_COOKIE_HTTPONLY = True
@@ -7,6 +7,7 @@ from flask import (
     Blueprint,
     current_app,
     flash,
+    jsonify,
     redirect,
     render_template,
     request,
@@ -19,7 +20,13 @@ from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
 
 from models import Score, User, db
-from services.cloudinary_service import delete_avatar, is_cloudinary_url, upload_avatar
+from services.cloudinary_service import (
+    delete_avatar,
+    is_cloudinary_url,
+    sign_avatar_upload,
+    upload_avatar,
+    verified_avatar_url,
+)
 
 # Upload settings
 ALLOWED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif"}
@@ -54,23 +61,28 @@ except ImportError:
     limiter = None
 
 # Simple in-memory rate limiting for login attempts per IP (legacy fallback)
-_LOGIN_ATTEMPTS: Dict[str, List[float]] = {}
 _LOGIN_WINDOW = 10 * 60  # 10 minutes
 _LOGIN_MAX = 5
 
 
+def _login_attempts() -> Dict[str, List[float]]:
+    """Recent login attempt times per IP, kept per app (created in create_app)."""
+    return current_app.extensions["login_attempts"]
+
+
 def _rate_limit_ip(ip: str) -> bool:
     now = time.time()
-    entries = _LOGIN_ATTEMPTS.get(ip, [])
+    attempts = _login_attempts()
+    entries = attempts.get(ip, [])
     # keep only attempts within window
     entries = [t for t in entries if now - t < _LOGIN_WINDOW]
     allowed = len(entries) < _LOGIN_MAX
     if not allowed:
-        _LOGIN_ATTEMPTS[ip] = entries
+        attempts[ip] = entries
         return False
     # record this attempt
     entries.append(now)
-    _LOGIN_ATTEMPTS[ip] = entries
+    attempts[ip] = entries
     return True
 
 
@@ -142,9 +154,10 @@ def register():
             )
 
         try:
-            user = User(
-                username=username, email=email, password_hash=generate_password_hash(password)
+            password_hash = generate_password_hash(
+                password, method=current_app.config["PASSWORD_HASH_METHOD"]
             )
+            user = User(username=username, email=email, password_hash=password_hash)
             db.session.add(user)
             db.session.commit()
             # Auto-login the newly registered user and redirect to main page
@@ -244,7 +257,7 @@ def login():
             if user and check_password_hash(user.password_hash, password):
                 login_user(user, remember=remember)
                 # Reset attempts on success for this IP
-                _LOGIN_ATTEMPTS.pop(ip, None)
+                _login_attempts().pop(ip, None)
                 current_app.logger.info(
                     "login_success username=%s id=%s ip=%s", user.username, user.id, ip
                 )
@@ -382,7 +395,52 @@ def profile():
                 avatar_token = str(int(os.path.getmtime(full)))
         except Exception:
             avatar_token = None
-    return render_template("auth/profile.html", avatar_version=avatar_token)
+    return render_template(
+        "auth/profile.html",
+        avatar_version=avatar_token,
+        max_avatar_size=MAX_AVATAR_SIZE,
+        avatar_mime_types=sorted(ALLOWED_MIME_TYPES),
+    )
+
+
+@auth_bp.route("/profile/avatar/signature", methods=["POST"])
+@login_required
+def avatar_upload_signature():
+    """Sign a direct browser-to-Cloudinary avatar upload for the current user."""
+    params = sign_avatar_upload(current_user.id)
+    if params is None:
+        # Cloudinary not configured: client falls back to the multipart /profile form
+        return jsonify({"error": "Direct upload unavailable"}), 404
+    return jsonify(params), 202
+
+
+@auth_bp.route("/profile/avatar", methods=["POST"])
+@login_required
+def avatar_upload_complete():
+    """Record an avatar the browser uploaded directly, from Cloudinary's signed response."""
+    data = request.get_json(silent=True) or {}
+    # Only a response Cloudinary signed for this user's public_id is accepted
+    url = verified_avatar_url(
+        current_user.id,
+        str(data.get("public_id", "")),
+        str(data.get("version", "")),
+        str(data.get("signature", "")),
+        str(data["format"]) if data.get("format") else None,
+    )
+    if url is None:
+        return jsonify({"error": "Invalid avatar upload"}), 400
+
+    # Cloudinary overwrote the same public_id; only a local avatar needs cleanup
+    if current_user.avatar and not is_cloudinary_url(current_user.avatar):
+        delete_avatar(current_user.avatar)
+    current_user.avatar = url
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("avatar_direct_upload_failed id=%s", current_user.id)
+        return jsonify({"error": "Failed to save avatar"}), 500
+    return jsonify({"avatar": url}), 200
 
 
 @auth_bp.route("/leaderboard")
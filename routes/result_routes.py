@@ -8,10 +8,13 @@ from models import Score, db
 
 result_bp = Blueprint("result", __name__)
 
+# Date source for streak bookkeeping; tests swap it to simulate other days
+_today = date.today
+
 
 def _update_user_streak(user):
     """Update user's quiz streak based on current date."""
-    today = date.today()
+    today = _today()
     last_quiz_date = user.last_quiz_date
 
     if last_quiz_date is None:
@@ -1,12 +1,29 @@
 """Cloudinary service for avatar uploads with fallback to local storage."""
 
+import hmac
 import os
+import re
+import time
 from typing import Optional
 
 import cloudinary
 import cloudinary.uploader
+import cloudinary.utils
 from flask import current_app
 
+_CLOUDINARY_PREFIX = "https://res.cloudinary.com/"
+_AVATAR_FOLDER = "quiz_app_avatars"
+# URL format: https://res.cloudinary.com/{cloud_name}/image/upload/v{version}/{folder}/{public_id}.{ext}
+_CLOUDINARY_RE = re.compile(
+    r"^https://res\.cloudinary\.com/([^/]+)/image/upload/(?:v\d+/)?quiz_app_avatars/"
+    r"([^/.]+)(?:\.[A-Za-z0-9]+)?$"
+)
+# Image formats accepted for direct uploads: signed into allowed_formats so Cloudinary
+# enforces them, and re-checked against the format the upload response reports
+_AVATAR_FORMATS = {"png", "jpg", "jpeg", "gif"}
+# Upload directories already created in this process (skips repeat makedirs syscalls)
+_ENSURED_DIRS: set[str] = set()
+
 
 def init_cloudinary():
     """Initialize Cloudinary with environment variables."""
@@ -38,10 +55,11 @@ def upload_avatar(file, user_id: int) -> str:
 
     if cloudinary_enabled:
         try:
-            # Upload to Cloudinary
+            # Plain upload: avatars are capped at 2 MB, so chunking would still send a
+            # single part, and upload_large closes the stream the local fallback needs
             result = cloudinary.uploader.upload(
-                file,
-                folder="quiz_app_avatars",
+                file.stream,
+                folder=_AVATAR_FOLDER,
                 public_id=f"user_{user_id}",
                 overwrite=True,
                 resource_type="image",
@@ -54,19 +72,21 @@ def upload_avatar(file, user_id: int) -> str:
             return result["secure_url"]
         except Exception as e:
             current_app.logger.error(f"Cloudinary upload failed: {str(e)}")
+            # The SDK may have read the stream before failing; rewind for the local save
+            file.stream.seek(0)
             # Fall through to local storage
 
     # Fallback to local storage (development/testing)
-    from datetime import UTC, datetime
-
     from werkzeug.utils import secure_filename
 
     filename = secure_filename(file.filename)
     _, ext = os.path.splitext(filename)
-    safe_name = f"user_{user_id}_{int(datetime.now(UTC).timestamp())}{ext}"
+    safe_name = f"user_{user_id}_{int(time.time())}{ext}"
 
     upload_dir = os.path.join(str(current_app.static_folder), "uploads")
-    os.makedirs(upload_dir, exist_ok=True)
+    if upload_dir not in _ENSURED_DIRS:
+        os.makedirs(upload_dir, exist_ok=True)
+        _ENSURED_DIRS.add(upload_dir)
     save_path = os.path.join(upload_dir, safe_name)
 
     file.save(save_path)
@@ -76,6 +96,101 @@ def upload_avatar(file, user_id: int) -> str:
     return f"uploads/{safe_name}"
 
 
+def sign_avatar_upload(user_id: int) -> Optional[dict]:
+    """
+    Sign a direct browser-to-Cloudinary avatar upload.
+
+    The browser POSTs the file with these params to ``upload_url`` so avatar bytes
+    never pass through this server. Returns None when Cloudinary is not configured;
+    callers then fall back to the server-side ``upload_avatar`` path.
+
+    Args:
+        user_id: User ID for unique naming
+
+    Returns:
+        Upload params plus ``signature``, ``api_key`` and ``upload_url``, or None
+    """
+    if not init_cloudinary():
+        return None
+
+    params = {
+        "folder": _AVATAR_FOLDER,
+        "public_id": f"user_{user_id}",
+        "overwrite": "true",
+        "timestamp": int(time.time()),
+        # Same 200x200 face crop as upload_avatar, applied by Cloudinary on ingest
+        "transformation": "c_fill,g_face,h_200,w_200/q_auto:good",
+        # Signed, so Cloudinary itself rejects other file types before overwriting
+        "allowed_formats": ",".join(sorted(_AVATAR_FORMATS)),
+    }
+    params["signature"] = cloudinary.utils.api_sign_request(
+        params, os.environ["CLOUDINARY_API_SECRET"]
+    )
+    params["api_key"] = os.environ["CLOUDINARY_API_KEY"]
+    params["upload_url"] = (
+        f"https://api.cloudinary.com/v1_1/{os.environ['CLOUDINARY_CLOUD_NAME']}/image/upload"
+    )
+    return params
+
+
+def avatar_public_id(url: Optional[str]) -> Optional[str]:
+    """Return the public_id (e.g. ``user_1``) of an avatar URL in our Cloudinary folder.
+
+    Only URLs on the configured ``CLOUDINARY_CLOUD_NAME`` account match.
+    """
+    if not url:
+        return None
+    m = _CLOUDINARY_RE.match(url)
+    if not m or m.group(1) != os.environ.get("CLOUDINARY_CLOUD_NAME"):
+        return None
+    return m.group(2)
+
+
+def verified_avatar_url(
+    user_id: int,
+    public_id: str,
+    version: str,
+    signature: str,
+    fmt: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Build the URL of an avatar the browser uploaded directly, if Cloudinary signed it.
+
+    The upload response's ``signature`` covers its ``public_id`` and ``version``; it is
+    checked against our API secret (in constant time) so a client cannot point its avatar at an image it
+    did not upload through ``sign_avatar_upload``. The URL is built here, never taken
+    from the client.
+
+    Args:
+        user_id: User ID the upload was signed for
+        public_id: Full public_id from the upload response (folder included)
+        version: Asset version from the upload response
+        signature: Response signature from the upload response
+        fmt: Optional delivery format (file extension) from the upload response
+
+    Returns:
+        Secure delivery URL, or None if the response is not a valid upload for this user
+    """
+    if not init_cloudinary():
+        return None
+    if public_id != f"{_AVATAR_FOLDER}/user_{user_id}" or not str(version).isdigit():
+        return None
+    if fmt is not None and fmt not in _AVATAR_FORMATS:
+        return None
+    config = cloudinary.config()
+    expected = cloudinary.utils.api_sign_request(
+        {"public_id": public_id, "version": version},
+        config.api_secret,
+        config.signature_algorithm,
+    )
+    if not hmac.compare_digest(expected.encode(), signature.encode()):
+        return None
+    url, _options = cloudinary.utils.cloudinary_url(
+        public_id, version=version, format=fmt, resource_type="image", type="upload", secure=True
+    )
+    return url
+
+
 def delete_avatar(avatar_url_or_path: Optional[str]) -> bool:
     """
     Delete avatar from Cloudinary or local storage.
@@ -90,18 +205,14 @@ def delete_avatar(avatar_url_or_path: Optional[str]) -> bool:
         return False
 
     # Check if it's a Cloudinary URL
-    if avatar_url_or_path.startswith("https://res.cloudinary.com/"):
+    if avatar_url_or_path.startswith(_CLOUDINARY_PREFIX):
         cloudinary_enabled = init_cloudinary()
         if cloudinary_enabled:
             try:
-                # Extract public_id from URL
-                # URL format: https://res.cloudinary.com/{cloud_name}/image/upload/v{version}/{folder}/{public_id}.{ext}
-                parts = avatar_url_or_path.split("/")
-                if "quiz_app_avatars" in parts:
-                    idx = parts.index("quiz_app_avatars")
-                    public_id_with_ext = parts[idx + 1]
-                    public_id = os.path.splitext(public_id_with_ext)[0]
-                    full_public_id = f"quiz_app_avatars/{public_id}"
+                # Extract public_id from URL in a single pass
+                public_id = avatar_public_id(avatar_url_or_path)
+                if public_id:
+                    full_public_id = f"{_AVATAR_FOLDER}/{public_id}"
 
                     cloudinary.uploader.destroy(full_public_id)
                     current_app.logger.info(f"Cloudinary avatar deleted: {full_public_id}")
@@ -126,4 +237,4 @@ def delete_avatar(avatar_url_or_path: Optional[str]) -> bool:
 
 def is_cloudinary_url(avatar: str | None) -> bool:
     """Check if avatar is a Cloudinary URL."""
-    return bool(avatar) and str(avatar).startswith("https://res.cloudinary.com/")
+    return bool(avatar) and str(avatar).startswith(_CLOUDINARY_PREFIX)
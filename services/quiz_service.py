@@ -1,7 +1,10 @@
-import html
 import os
 import random
+import threading
+import time
+from collections import OrderedDict
 from typing import Any, Dict, List, Optional, cast
+from urllib.parse import unquote
 
 import requests
 
@@ -19,12 +22,24 @@ CATEGORY_MAP = {
 }
 
 
-_QUESTION_CACHE: dict = {}
-# Allow TTL override via env var QUIZ_CACHE_TTL (seconds)
-try:
-    _CACHE_TTL_SECONDS = int(os.getenv("QUIZ_CACHE_TTL", "120"))
-except ValueError:
-    _CACHE_TTL_SECONDS = 120
+# Bounded LRU of fetched question sets; oldest entries are evicted past the cap
+_QUESTION_CACHE: "OrderedDict[tuple, dict]" = OrderedDict()
+_CACHE_MAX_ENTRIES = 512
+# Threaded servers share the cache; lookups and mutations happen under this lock
+_CACHE_LOCK = threading.Lock()
+# Cache clock; monotonic is immune to wall-clock jumps. Module-level so tests can swap it
+_now = time.monotonic
+
+
+def _cache_ttl_seconds() -> int:
+    """Return the cache TTL, overridable via env var QUIZ_CACHE_TTL (seconds).
+
+    Read on every lookup so a changed environment applies without re-importing.
+    """
+    try:
+        return int(os.getenv("QUIZ_CACHE_TTL", "120"))
+    except ValueError:
+        return 120
 
 
 class TriviaService:
@@ -55,18 +70,17 @@ class TriviaService:
         self, amount: int = 1, category_id: Optional[int] = None, difficulty: Optional[str] = None
     ) -> List[Dict]:
         """Call OpenTDB with simple retry/backoff; return list of raw question dicts (may be empty)."""
-        params: Dict[str, Any] = {"amount": amount, "type": "multiple"}
+        # RFC 3986 percent-encoding decodes with a plain unquote (no HTML entity pass)
+        params: Dict[str, Any] = {"amount": amount, "type": "multiple", "encode": "url3986"}
         if category_id:
             params["category"] = category_id
         if difficulty and difficulty in ["easy", "medium", "hard"]:
             params["difficulty"] = difficulty
-        # dynamic linear backoff sequence based on configured retries
-        backoffs = [i * 0.4 for i in range(self.retries)]  # 0.0, 0.4, 0.8, ...
-        for delay in backoffs:
-            if delay:
-                import time as _t
-
-                _t.sleep(delay)
+        # exponential backoff (0.25s, 0.5s, 1.0s, ...) plus jitter so concurrent
+        # clients don't retry in lockstep during OpenTDB outages
+        for attempt in range(self.retries):
+            if attempt:
+                time.sleep((2 ** (attempt - 1)) * 0.25 + random.random() * 0.1)
             try:
                 resp = requests.get(
                     "https://opentdb.com/api.php", params=cast(Any, params), timeout=self.timeout
@@ -88,16 +102,22 @@ class TriviaService:
         Returns list of question dicts with keys: question, options, correct, explanation
         Difficulty can be 'easy', 'medium', or 'hard'
         """
-        import time
-
         questions = []
-
-        # Basic cache key using sorted topics and requested total
-        key = (tuple(sorted(topics)), total_needed)
-        now = time.time()
-        cached = _QUESTION_CACHE.get(key)
-        if cached and (now - cached["ts"] < _CACHE_TTL_SECONDS):
-            return cached["data"][:]
+        # Local binding: one shuffled copy per question via a single sample() call
+        _sample = random.sample
+
+        # Basic cache key using sorted topics, requested total and difficulty
+        key = (tuple(sorted(topics)), total_needed, difficulty)
+        # Whole seconds suffice for the TTL
+        now = int(_now())
+        with _CACHE_LOCK:
+            cached = _QUESTION_CACHE.get(key)
+            if cached:
+                if now - cached["ts"] < _cache_ttl_seconds():
+                    _QUESTION_CACHE.move_to_end(key)
+                    return cached["data"][:]
+                # Expired: drop it so stale entries don't linger
+                del _QUESTION_CACHE[key]
 
         if not topics:
             return []
@@ -123,10 +143,10 @@ class TriviaService:
             except Exception:
                 raw = []
             for r in raw:
-                q_text = html.unescape(r.get("question", ""))
-                correct = html.unescape(r.get("correct_answer", ""))
-                options = [html.unescape(x) for x in r.get("incorrect_answers", [])] + [correct]
-                random.shuffle(options)
+                q_text = unquote(r.get("question", ""))
+                correct = unquote(r.get("correct_answer", ""))
+                incorrect = [unquote(x) for x in r.get("incorrect_answers", [])]
+                options = _sample([*incorrect, correct], k=len(incorrect) + 1)
                 # Generate explanation based on question type and correct answer
                 explanation = self._generate_explanation(q_text, correct, t)
                 if q_text and correct:
@@ -149,10 +169,10 @@ class TriviaService:
             except Exception:
                 raw = []
             for r in raw:
-                q_text = html.unescape(r.get("question", ""))
-                correct = html.unescape(r.get("correct_answer", ""))
-                options = [html.unescape(x) for x in r.get("incorrect_answers", [])] + [correct]
-                random.shuffle(options)
+                q_text = unquote(r.get("question", ""))
+                correct = unquote(r.get("correct_answer", ""))
+                incorrect = [unquote(x) for x in r.get("incorrect_answers", [])]
+                options = _sample([*incorrect, correct], k=len(incorrect) + 1)
                 # Generate explanation for fallback questions (category is unknown)
                 explanation = self._generate_explanation(q_text, correct, "General Knowledge")
                 if q_text and correct:
@@ -179,8 +199,12 @@ class TriviaService:
         else:
             final = random.sample(questions, total_needed)
 
-        # Store in cache
-        _QUESTION_CACHE[key] = {"data": final[:], "ts": now}
+        # Store in cache, evicting least recently used entries beyond the cap
+        with _CACHE_LOCK:
+            _QUESTION_CACHE[key] = {"data": final[:], "ts": now}
+            _QUESTION_CACHE.move_to_end(key)
+            while len(_QUESTION_CACHE) > _CACHE_MAX_ENTRIES:
+                _QUESTION_CACHE.popitem(last=False)
         return final
 
     def _generate_explanation(self, question: str, correct_answer: str, category: str) -> str:
@@ -0,0 +1,199 @@
+"""Shared fixtures: one Flask app and schema per test session, clean tables per test."""
+
+import functools
+import sqlite3
+
+import pytest
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug import security
+
+from app import create_app
+from config import Config
+from models import db
+
+TEST_CONFIG = {"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"}
+FAST_HASH_METHOD = "pbkdf2:sha256:1"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _fast_password_hashing():
+    """Make apps built without TESTING hash new passwords with one PBKDF2 round.
+
+    TESTING apps already get that method from create_app; the CSRF and password-policy
+    apps read it from Config. Users seeded by tests hash through ``hash_password``.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(Config, "PASSWORD_HASH_METHOD", FAST_HASH_METHOD)
+        yield
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _tmp_session_dir(tmp_path_factory):
+    """Keep server-side session files of every app built in tests out of instance/."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(
+            Config, "SESSION_FILE_DIR", str(tmp_path_factory.mktemp("flask_session")), raising=False
+        )
+        yield
+
+
+@pytest.fixture(scope="session")
+def hash_password():
+    """Return generate_password_hash bound to the fast test method, for seeding users.
+
+    check_password_hash reads the method back out of the stored hash, so logins work.
+    """
+    return functools.partial(security.generate_password_hash, method=FAST_HASH_METHOD)
+
+
+@pytest.fixture(scope="session")
+def test_password_hash(hash_password):
+    """Hash of the "Test123!" password the login fixtures use, computed once per session."""
+    return hash_password("Test123!")
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_app(cfg_items: tuple):
+    return create_app(dict(cfg_items))
+
+
+@pytest.fixture(scope="session")
+def make_app():
+    """Return a factory that builds one app per distinct config and reuses it afterwards.
+
+    Cached apps are shared, so tests must not add routes or change their config; each
+    test still pushes its own app context.
+    """
+
+    def _make_app(cfg: dict | None = None):
+        return _cached_app(tuple(sorted((cfg or {}).items())))
+
+    return _make_app
+
+
+@event.listens_for(Engine, "connect")
+def _sqlite_test_pragmas(dbapi_connection, _connection_record):
+    """Drop durability work that a throwaway test database never needs.
+
+    Registered on Engine at import, before any test builds an app, so it covers the
+    connections create_app opens as well as every later one.
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA journal_mode=MEMORY")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    # An in-memory database is private to this process, so take the lock once and keep
+    # it; file databases may be opened by other xdist workers
+    if cursor.execute("PRAGMA database_list").fetchone()[2] == "":
+        cursor.execute("PRAGMA locking_mode=EXCLUSIVE")
+    cursor.close()
+
+
+@pytest.fixture(scope="session")
+def csrf_app(make_app):
+    """Production-mode app (no TESTING, so CSRF is enforced) on its own in-memory database."""
+    return make_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+
+
+@pytest.fixture(scope="session")
+def app(make_app):
+    """Build the app once; the in-memory schema lives as long as the session.
+
+    Flask-SQLAlchemy serves ``sqlite:///:memory:`` from a StaticPool, so every session
+    and request shares one connection, and the tables create_app makes for SQLite
+    databases persist without another create_all.
+    """
+    app = make_app(TEST_CONFIG)
+
+    # Compile every template up front instead of on each page's first request; the
+    # on-disk bytecode cache (keyed by source checksum) lets later runs skip compiling.
+    # No directory argument: Jinja's default is a per-user 0700 dir it checks ownership of
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    return app
+
+
+def _sqlite_connection() -> sqlite3.Connection:
+    """Return the driver connection behind the StaticPool (the in-memory database itself)."""
+    pooled = db.engine.raw_connection()
+    try:
+        return pooled.driver_connection
+    finally:
+        pooled.close()
+
+
+@pytest.fixture
+def db_session(app):
+    """Push a fresh app context for the test and restore the database afterwards.
+
+    Routes commit on their own, so instead of a SAVEPOINT rollback (unreliable with
+    pysqlite's implicit transactions) the in-memory database is copied aside with
+    sqlite3's online backup API when the test starts and copied back when it ends.
+    Rows seeded by wider-scoped fixtures survive; anything the test changed does not.
+    """
+    with app.app_context():
+        live = _sqlite_connection()
+        snapshot = sqlite3.connect(":memory:")
+        live.backup(snapshot)
+        yield db.session
+        db.session.rollback()
+        db.session.close()
+        snapshot.backup(live)
+        snapshot.close()
+    # Registration records user ids by client IP; ids are reused once rows are rolled back
+    app.config.pop("_RECENT_REG", None)
+    # Every test client logs in from 127.0.0.1, so start each test under the login limit
+    app.extensions["login_attempts"].clear()
+
+
+@pytest.fixture
+def tmp_static(monkeypatch, tmp_path, app):
+    """Point the app's static folder at a per-test temp dir so local avatars never hit static/."""
+    monkeypatch.setattr(app, "static_folder", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def client(app, db_session):
+    """Test client kept open for the whole test.
+
+    Each request's context stays pushed until the next request, so tests can inspect
+    ``request``, ``session`` and ``g`` after a call without a ``with client:`` block.
+    """
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def login_as(client):
+    """Return a helper that authenticates ``client`` as a user without the /login round trip.
+
+    It writes the keys Flask-Login reads from the session, skipping the password check
+    and redirect. Tests of the login flow itself should keep posting to /login.
+    """
+
+    def _login_as(user_id):
+        with client.session_transaction() as sess:
+            sess["_user_id"] = str(user_id)
+            sess["_fresh"] = True
+
+    return _login_as
+
+
+@pytest.fixture
+def flashed_messages(client):
+    """Return a helper listing messages flashed into ``client``'s session but not yet shown.
+
+    Lets tests assert on a redirect plus its flash without rendering the target page.
+    """
+
+    def _flashed_messages():
+        with client.session_transaction() as sess:
+            return [message for _category, message in sess.get("_flashes", [])]
+
+    return _flashed_messages
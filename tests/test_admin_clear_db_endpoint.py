@@ -2,17 +2,29 @@ import importlib
 import os
 import types
 
+import pytest
 from flask import Flask
 
 
-def test_admin_clear_db_token_flow(monkeypatch):
-    admin_mod = importlib.import_module("admin_clear_db")
+@pytest.fixture(scope="session")
+def admin_mod():
+    return importlib.import_module("admin_clear_db")
 
+
+@pytest.fixture(scope="session")
+def app(admin_mod):
     app = Flask(__name__)
     app.config.update(SECRET_KEY="test")
     app.register_blueprint(admin_mod.admin_bp)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
 
-    client = app.test_client()
+def test_admin_clear_db_token_flow(monkeypatch, admin_mod, client):
 
     # 403 when ADMIN_CLEAR_TOKEN is not set
     if "ADMIN_CLEAR_TOKEN" in os.environ:
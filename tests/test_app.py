@@ -1,178 +1,191 @@
-import json
-import unittest
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 
-from werkzeug.security import generate_password_hash
+import pytest
 
-from app import create_app
 from models import Score, User, db
 
 
-class QuizAppTestCase(unittest.TestCase):
-    def setUp(self):
-        # Create app with test config so DB is initialized correctly for tests
-        test_cfg = {"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"}
-        self.app = create_app(test_cfg)
-        self.client = self.app.test_client()
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        db.create_all()
-        self._create_test_data()
-
-    def tearDown(self):
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
-
-    def _create_test_data(self):
-        # Create test users
-        users = [
-            User(
-                username="test_user",
-                email="test@test.com",
-                password_hash=generate_password_hash("password123"),
-            ),
-            User(
-                username="another_user",
-                email="another@test.com",
-                password_hash=generate_password_hash("password123"),
-            ),
-        ]
-        for user in users:
-            db.session.add(user)
+def _create_test_data(hash_password):
+    # Create test users
+    users = [
+        User(
+            username="test_user",
+            email="test@test.com",
+            password_hash=hash_password("password123"),
+        ),
+        User(
+            username="another_user",
+            email="another@test.com",
+            password_hash=hash_password("password123"),
+        ),
+    ]
+    # return_defaults fetches the new primary keys so scores can reference them
+    db.session.bulk_save_objects(users, return_defaults=True)
+
+    # Create test scores
+    base_date = datetime.now()
+    scores = [
+        Score(
+            user_id=users[0].id,
+            quiz_name="Python Basics",
+            score=8,
+            max_score=10,
+            date_taken=base_date - timedelta(days=1),
+        ),
+        Score(
+            user_id=users[0].id,
+            quiz_name="JavaScript Basics",
+            score=7,
+            max_score=10,
+            date_taken=base_date - timedelta(days=2),
+        ),
+        Score(
+            user_id=users[1].id,
+            quiz_name="Python Basics",
+            score=9,
+            max_score=10,
+            date_taken=base_date - timedelta(days=1),
+        ),
+    ]
+    db.session.bulk_save_objects(scores, return_defaults=True)
+    db.session.commit()
+    return SimpleNamespace(
+        users={user.username: user.id for user in users},
+        scores=[score.id for score in scores],
+    )
+
+
+@pytest.fixture(scope="module")
+def seeded(app, hash_password):
+    """Seed users and scores once for the module and yield their ids.
+
+    ``seeded.users`` maps username to id and ``seeded.scores`` lists score ids. Whatever a
+    test changes is rolled back by db_session.
+    """
+    with app.app_context():
+        ids = _create_test_data(hash_password)
+    yield ids
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
         db.session.commit()
 
-        # Create test scores
-        base_date = datetime.now()
-        scores = [
-            Score(
-                user_id=1,
-                quiz_name="Python Basics",
-                score=8,
-                max_score=10,
-                date_taken=base_date - timedelta(days=1),
-            ),
-            Score(
-                user_id=1,
-                quiz_name="JavaScript Basics",
-                score=7,
-                max_score=10,
-                date_taken=base_date - timedelta(days=2),
-            ),
-            Score(
-                user_id=2,
-                quiz_name="Python Basics",
-                score=9,
-                max_score=10,
-                date_taken=base_date - timedelta(days=1),
-            ),
-        ]
-        for score in scores:
-            db.session.add(score)
-        db.session.commit()
 
-    def test_homepage(self):
+pytestmark = pytest.mark.usefixtures("seeded")
+
+
+class TestHomepage:
+    def test_homepage(self, client):
         """Test the homepage loads correctly"""
-        response = self.client.get("/")
-        self.assertEqual(response.status_code, 200)
+        response = client.get("/")
+        assert response.status_code == 200
 
-    def test_registration(self):
+
+class TestAuth:
+    def test_registration(self, client):
         """Test user registration process"""
         # Test successful registration
-        response = self.client.post(
+        response = client.post(
             "/register",
             data={"username": "new_user", "email": "new@test.com", "password": "password123"},
-            follow_redirects=True,
         )
-        self.assertEqual(response.status_code, 200)
+        assert response.status_code == 302
+        assert response.headers["Location"].endswith("/dashboard")
 
         # Test duplicate username
-        response = self.client.post(
+        response = client.post(
             "/register",
             data={
                 "username": "test_user",
                 "email": "different@test.com",
                 "password": "password123",
             },
-            follow_redirects=True,
         )
-        self.assertIn(b"Username already exists", response.data)
+        assert b"Username already exists" in response.data
 
-    def test_login_logout(self):
+    def test_login_logout(self, client):
         """Test login and logout functionality"""
         # Test successful login
-        response = self.client.post(
+        response = client.post(
             "/login",
             data={"username": "test_user", "password": "password123"},
-            follow_redirects=True,
         )
-        self.assertEqual(response.status_code, 200)
+        assert response.status_code == 302
 
         # Test invalid login
-        response = self.client.post(
+        response = client.post(
             "/login",
             data={"username": "test_user", "password": "wrongpassword"},
-            follow_redirects=True,
         )
-        self.assertIn(b"Invalid username or password", response.data)
+        assert b"Invalid username or password" in response.data
 
         # Test logout
-        response = self.client.get("/logout", follow_redirects=True)
-        self.assertEqual(response.status_code, 200)
+        response = client.get("/logout")
+        assert response.status_code == 302
 
-    def test_protected_routes(self):
+    def test_protected_routes(self, client, flashed_messages):
         """Test access to protected routes"""
         # Try accessing protected route without login
-        response = self.client.get("/dashboard", follow_redirects=True)
-        self.assertIn(b"Please log in", response.data)
+        response = client.get("/dashboard")
+        assert response.status_code == 302
+        assert "/login" in response.headers["Location"]
+        assert any("Please log in" in message for message in flashed_messages())
 
         # Login and try again
-        self.client.post("/login", data={"username": "test_user", "password": "password123"})
-        response = self.client.get("/dashboard")
-        self.assertEqual(response.status_code, 200)
+        client.post("/login", data={"username": "test_user", "password": "password123"})
+        response = client.get("/dashboard")
+        assert response.status_code == 200
+
 
-    def test_quiz_flow(self):
+class TestQuiz:
+    def test_quiz_flow(self, client, login_as, seeded):
         """Test the quiz taking process"""
         # Login first
-        self.client.post("/login", data={"username": "test_user", "password": "password123"})
+        login_as(seeded.users["test_user"])
 
         # Start quiz
-        response = self.client.post(
-            "/quiz", data={"quiz_type": "Python Basics"}, follow_redirects=True
-        )
-        self.assertEqual(response.status_code, 200)
+        response = client.post("/quiz", data={"quiz_type": "Python Basics"})
+        assert response.status_code == 302
+        assert response.headers["Location"].endswith("/question")
 
         # Answer questions
-        response = self.client.post(
+        response = client.post(
             "/question", data={"answer": "0"}  # Assuming multiple choice with index 0
         )
-        self.assertEqual(response.status_code, 200)
+        assert response.status_code == 200
 
-    def test_leaderboard(self):
+
+class TestLeaderboard:
+    def test_leaderboard(self, client, login_as, seeded):
         """Test leaderboard functionality"""
         # Login first
-        self.client.post("/login", data={"username": "test_user", "password": "password123"})
+        login_as(seeded.users["test_user"])
 
         # Access leaderboard
-        response = self.client.get("/leaderboard")
-        self.assertEqual(response.status_code, 200)
-        self.assertIn(b"test_user", response.data)  # Should show our test user
+        response = client.get("/leaderboard")
+        assert response.status_code == 200
+        assert b"test_user" in response.data  # Should show our test user
+
 
-    def test_dashboard(self):
+class TestDashboard:
+    def test_dashboard(self, client, login_as, seeded):
         """Test dashboard functionality"""
         # Login first
-        self.client.post("/login", data={"username": "test_user", "password": "password123"})
+        login_as(seeded.users["test_user"])
 
         # Access dashboard
-        response = self.client.get("/dashboard")
-        self.assertEqual(response.status_code, 200)
-        self.assertIn(b"Python Basics", response.data)  # Should show quiz name
-        self.assertIn(b"JavaScript Basics", response.data)
+        response = client.get("/dashboard")
+        assert response.status_code == 200
+        assert b"Python Basics" in response.data  # Should show quiz name
+        assert b"JavaScript Basics" in response.data
+
 
-    def test_score_calculation(self):
+class TestScoreCalc:
+    def test_score_calculation(self, client, login_as, seeded):
         """Test score calculation and statistics"""
-        user = User.query.filter_by(username="test_user").first()
-        scores = Score.query.filter_by(user_id=user.id).all()
+        user_id = seeded.users["test_user"]
+        scores = Score.query.filter_by(user_id=user_id).all()
 
         # Calculate expected statistics
         total_score = sum(score.score for score in scores)
@@ -180,14 +193,10 @@ class QuizAppTestCase(unittest.TestCase):
         expected_average = (total_score / total_possible) * 100
 
         # Login and check dashboard
-        self.client.post("/login", data={"username": "test_user", "password": "password123"})
-        response = self.client.get("/dashboard")
-        self.assertEqual(response.status_code, 200)
+        login_as(user_id)
+        response = client.get("/dashboard")
+        assert response.status_code == 200
 
         # Basic checks for score display
-        self.assertTrue(str(total_score).encode() in response.data)
-        self.assertTrue(str(len(scores)).encode() in response.data)
-
-
-if __name__ == "__main__":
-    unittest.main()
+        assert str(total_score).encode() in response.data
+        assert str(len(scores)).encode() in response.data
@@ -2,23 +2,10 @@
 
 from unittest.mock import patch
 
-import pytest
-
 from app import create_app
 from models import db
 
-
-@pytest.fixture
-def app():
-    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
-    with app.app_context():
-        db.create_all()
-        yield app
-
-
-@pytest.fixture
-def client(app):
-    return app.test_client()
+_CSP_REQUIRED = ("default-src 'self'", "https://cdn.jsdelivr.net", "https://res.cloudinary.com")
 
 
 def test_404_error_handler(client):
@@ -28,8 +15,10 @@ def test_404_error_handler(client):
     assert b"404" in response.data or b"Not Found" in response.data
 
 
-def test_500_error_handler(app):
+def test_500_error_handler():
     """Test 500 error handler."""
+    # Routes can't be added to the shared app once it has served a request
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
 
     # Create a route that raises an exception
     @app.route("/trigger-500")
@@ -45,15 +34,12 @@ def test_500_error_handler(app):
     assert response.status_code == 500
 
 
-def test_csrf_error_handler(client):
+def test_csrf_error_handler(csrf_app):
     """Test CSRF error handling."""
     # Attempt POST without CSRF token when CSRF is enabled
-    prod_app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+    prod_app = csrf_app
     prod_client = prod_app.test_client()
 
-    with prod_app.app_context():
-        db.create_all()
-
     # POST to register without CSRF token
     response = prod_client.post(
         "/register",
@@ -73,19 +59,16 @@ def test_csrf_error_handler(client):
 def test_security_headers(client):
     """Test that security headers are set correctly."""
     response = client.get("/")
+    headers = dict(response.headers)
 
     # Check security headers
-    assert response.headers.get("X-Frame-Options") == "DENY"
-    assert response.headers.get("X-Content-Type-Options") == "nosniff"
-    assert "Referrer-Policy" in response.headers
-    assert "Permissions-Policy" in response.headers
-    assert "Content-Security-Policy" in response.headers
+    assert headers["X-Frame-Options"] == "DENY"
+    assert headers["X-Content-Type-Options"] == "nosniff"
+    assert {"Referrer-Policy", "Permissions-Policy", "Content-Security-Policy"} <= headers.keys()
 
     # Verify CSP allows necessary resources
-    csp = response.headers.get("Content-Security-Policy", "")
-    assert "default-src 'self'" in csp
-    assert "https://cdn.jsdelivr.net" in csp
-    assert "https://res.cloudinary.com" in csp
+    csp = headers["Content-Security-Policy"]
+    assert all(source in csp for source in _CSP_REQUIRED)
 
 
 def test_healthz_endpoint_healthy(client):
@@ -97,12 +80,13 @@ def test_healthz_endpoint_healthy(client):
     assert data["db"] is True
 
 
+@patch("app.db.engine.dispose")
 @patch("app.db.session.execute")
-def test_healthz_endpoint_db_unavailable(mock_execute, app):
+def test_healthz_endpoint_db_unavailable(mock_execute, mock_dispose, client):
     """Test health check when database is temporarily unavailable."""
     mock_execute.side_effect = Exception("Database connection failed")
 
-    client = app.test_client()
+    # dispose() is stubbed: dropping the pool would discard the shared in-memory schema
     response = client.get("/healthz")
 
     # Should return 200 by default (non-strict mode)
@@ -111,22 +95,20 @@ def test_healthz_endpoint_db_unavailable(mock_execute, app):
     assert data["db"] is False
 
 
-def test_healthz_strict_mode(app):
+@patch("app.db.engine.dispose")
+def test_healthz_strict_mode(mock_dispose, client):
     """Test health check in strict mode returns 503 on db failure."""
     import os
 
     with patch.dict(os.environ, {"HEALTHZ_STRICT": "1"}):
         with patch("app.db.session.execute", side_effect=Exception("DB error")):
-            client = app.test_client()
             response = client.get("/healthz")
             # In strict mode, should return 503 when db is down
             assert response.status_code == 503
 
 
-def test_x_forwarded_proto_handling(app):
+def test_x_forwarded_proto_handling(client):
     """Test that X-Forwarded-Proto header is respected."""
-    client = app.test_client()
-
     # Simulate request from behind HTTPS proxy
     response = client.get("/", headers={"X-Forwarded-Proto": "https"})
     assert response.status_code == 200
@@ -151,38 +133,44 @@ def test_avatar_url_filter_cloudinary(app):
     assert result == cloudinary_url
 
 
-def test_avatar_url_filter_local(app):
+def test_avatar_url_filter_local(app, client):
     """Test avatar_url filter with local path."""
-    client = app.test_client()
-    with client:
-        # Make a request to establish request context
-        client.get("/")
+    # Make a request to establish request context
+    client.get("/")
 
-        avatar_filter = app.jinja_env.filters["avatar_url"]
-        local_path = "uploads/avatar.png"
-        result = avatar_filter(local_path)
-        assert "uploads/avatar.png" in result
+    avatar_filter = app.jinja_env.filters["avatar_url"]
+    local_path = "uploads/avatar.png"
+    result = avatar_filter(local_path)
+    assert "uploads/avatar.png" in result
 
 
-def test_avatar_url_filter_none(app):
+def test_avatar_url_filter_none(app, client):
     """Test avatar_url filter with None returns default."""
-    client = app.test_client()
-    with client:
-        # Make a request to establish request context
-        client.get("/")
+    # Make a request to establish request context
+    client.get("/")
 
-        avatar_filter = app.jinja_env.filters["avatar_url"]
-        result = avatar_filter(None)
-        assert "default-avatar.svg" in result
+    avatar_filter = app.jinja_env.filters["avatar_url"]
+    result = avatar_filter(None)
+    assert "default-avatar.svg" in result
 
 
-def test_database_initialization_sqlite(app):
+def test_database_initialization_sqlite(app, db_session):
     """Test that SQLite database is initialized on first run."""
     # This is already tested by fixture, but verify tables exist
-    with app.app_context():
-        from sqlalchemy import inspect
+    from sqlalchemy import inspect
+
+    inspector = inspect(db.engine)
+    tables = inspector.get_table_names()
+    assert "user" in tables
+    assert "score" in tables
+
+
+def test_memory_sqlite_engine_options(app, db_session):
+    """Test in-memory SQLite shares one pooled connection without QueuePool options."""
+    from sqlalchemy.pool import StaticPool
 
-        inspector = inspect(db.engine)
-        tables = inspector.get_table_names()
-        assert "user" in tables
-        assert "score" in tables
+    engine_options = app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+    assert isinstance(db.engine.pool, StaticPool)
+    assert engine_options["poolclass"] is StaticPool
+    assert engine_options["connect_args"]["check_same_thread"] is False
+    assert "pool_pre_ping" not in engine_options
@@ -1,140 +1,126 @@
 """Tests for profile avatar upload, password validation, and rate limiting."""
 
-import os
 import time
 from io import BytesIO
 
 import pytest
-from werkzeug.datastructures import FileStorage
-from werkzeug.security import generate_password_hash
+from werkzeug.test import EnvironBuilder
 
-from app import create_app
 from models import User, db
+from routes.auth_routes import _LOGIN_MAX, MAX_AVATAR_SIZE
 
+# Payloads are built once at import; each test wraps them in its own BytesIO
+_TINY_IMG = b"fake image content"
 
-@pytest.fixture
-def app():
-    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
-    with app.app_context():
-        db.create_all()
-        yield app
 
+def _encode_multipart(data):
+    """Encode form data into a multipart body once, returning (body, content_type)."""
+    builder = EnvironBuilder(method="POST", data=data)
+    try:
+        environ = builder.get_environ()
+        return environ["wsgi.input"].read(), environ["CONTENT_TYPE"]
+    finally:
+        builder.close()
 
-@pytest.fixture
-def client(app):
-    return app.test_client()
 
+_OVERSIZED_BODY, _OVERSIZED_CONTENT_TYPE = _encode_multipart(
+    {"avatar": (BytesIO(b"x" * (MAX_AVATAR_SIZE + 1)), "large.jpg")}
+)
 
-@pytest.fixture
-def logged_in_user(client, app):
-    """Create and login a user."""
-    # Clear rate limiter state for this session
-    from routes.auth_routes import _LOGIN_ATTEMPTS
 
-    _LOGIN_ATTEMPTS.clear()
+@pytest.fixture
+def profile_user_id(app, db_session, hash_password):
+    """Create the profile test user and return its id."""
+    user = User(
+        username="profiletest",
+        email="profile@test.com",
+        password_hash=hash_password("Test123!"),
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user.id
 
-    with app.app_context():
-        user = User(
-            username="profiletest",
-            email="profile@test.com",
-            password_hash=generate_password_hash("Test123!"),
-        )
-        db.session.add(user)
-        db.session.commit()
 
-    client.post(
-        "/login", data={"username": "profiletest", "password": "Test123!"}, follow_redirects=True
-    )
+@pytest.fixture
+def logged_in_user(client, login_as, profile_user_id):
+    """Create and login a user."""
+    login_as(profile_user_id)
     return client
 
 
-def test_profile_upload_avatar(logged_in_user, app):
+def test_profile_upload_avatar(logged_in_user, app, flashed_messages, profile_user_id, tmp_static):
     """Test uploading an avatar via profile page."""
-    file_data = BytesIO(b"fake image content")
+    file_data = BytesIO(_TINY_IMG)
     data = {
         "full_name": "Test User",
         "bio": "Test bio",
         "avatar": (file_data, "avatar.png"),
     }
 
-    response = logged_in_user.post(
-        "/profile", data=data, content_type="multipart/form-data", follow_redirects=True
-    )
+    response = logged_in_user.post("/profile", data=data, content_type="multipart/form-data")
 
-    assert response.status_code == 200
-    assert b"Profile updated successfully" in response.data
+    assert response.status_code == 302
+    assert "Profile updated successfully" in flashed_messages()
 
     # Verify user has avatar set
     with app.app_context():
-        user = User.query.filter_by(username="profiletest").first()
+        user = db.session.get(User, profile_user_id)
         assert user.avatar is not None
+        assert (tmp_static / user.avatar).read_bytes() == _TINY_IMG
         assert user.full_name == "Test User"
         assert user.bio == "Test bio"
 
 
-def test_profile_upload_invalid_extension(logged_in_user):
+def test_profile_upload_invalid_extension(logged_in_user, flashed_messages):
     """Test uploading file with invalid extension."""
-    file_data = BytesIO(b"fake file")
+    file_data = BytesIO(_TINY_IMG)
     data = {"avatar": (file_data, "document.pdf")}
 
-    response = logged_in_user.post(
-        "/profile", data=data, content_type="multipart/form-data", follow_redirects=True
-    )
+    response = logged_in_user.post("/profile", data=data, content_type="multipart/form-data")
 
-    assert response.status_code == 200
-    assert b"Unsupported file type" in response.data
+    assert response.status_code == 302
+    assert any("Unsupported file type" in message for message in flashed_messages())
 
 
-def test_profile_upload_oversized_file(logged_in_user):
+def test_profile_upload_oversized_file(logged_in_user, flashed_messages):
     """Test uploading file exceeding size limit."""
-    # Create file > 2MB
-    large_data = BytesIO(b"x" * (3 * 1024 * 1024))
-    data = {"avatar": (large_data, "large.jpg")}
-
+    # One byte over the limit; the multipart body is pre-encoded at import
     response = logged_in_user.post(
-        "/profile", data=data, content_type="multipart/form-data", follow_redirects=True
+        "/profile",
+        input_stream=BytesIO(_OVERSIZED_BODY),
+        content_type=_OVERSIZED_CONTENT_TYPE,
+        content_length=len(_OVERSIZED_BODY),
     )
 
-    assert response.status_code == 200
-    assert b"Avatar too large" in response.data
+    assert response.status_code == 302
+    assert any("Avatar too large" in message for message in flashed_messages())
 
 
-def test_profile_remove_avatar(app):
+def test_profile_remove_avatar(client, app, login_as, flashed_messages, hash_password):
     """Test removing existing avatar."""
-    # Clear rate limiter
-    from routes.auth_routes import _LOGIN_ATTEMPTS
-
-    _LOGIN_ATTEMPTS.clear()
-
-    client = app.test_client()
-
     # Create user with avatar already set
     with app.app_context():
         user = User(
             username="avatartest",
             email="avatar@test.com",
-            password_hash=generate_password_hash("Test123!"),
+            password_hash=hash_password("Test123!"),
             avatar="uploads/test_avatar.png",
         )
         db.session.add(user)
         db.session.commit()
         user_id = user.id
 
-    # Login
-    client.post(
-        "/login", data={"username": "avatartest", "password": "Test123!"}, follow_redirects=True
-    )
+    login_as(user_id)
 
     # Remove avatar
     response = client.post(
         "/profile",
         data={"remove_avatar": "1", "full_name": "", "bio": ""},
         content_type="multipart/form-data",
-        follow_redirects=True,
     )
 
-    assert response.status_code == 200
-    assert b"Profile updated successfully" in response.data
+    assert response.status_code == 302
+    assert "Profile updated successfully" in flashed_messages()
 
     # Verify avatar was removed
     with app.app_context():
@@ -142,6 +128,51 @@ def test_profile_remove_avatar(app):
         assert user.avatar is None, f"Expected avatar to be None, but got: {user.avatar}"
 
 
+def test_avatar_signature_unavailable_without_cloudinary(logged_in_user, monkeypatch):
+    """Test direct-upload signing reports unavailable so the client falls back."""
+    for key in ("CLOUDINARY_CLOUD_NAME", "CLOUDINARY_API_KEY", "CLOUDINARY_API_SECRET"):
+        monkeypatch.delenv(key, raising=False)
+
+    response = logged_in_user.post("/profile/avatar/signature")
+
+    assert response.status_code == 404
+
+
+def test_avatar_direct_upload_complete(logged_in_user, app, profile_user_id, monkeypatch):
+    """Test recording a direct upload only accepts a signed response for the user's public_id."""
+    import cloudinary.utils
+
+    monkeypatch.setenv("CLOUDINARY_CLOUD_NAME", "test")
+    monkeypatch.setenv("CLOUDINARY_API_KEY", "key")
+    monkeypatch.setenv("CLOUDINARY_API_SECRET", "secret")
+
+    def upload_response(public_id, version="1712"):
+        signature = cloudinary.utils.api_sign_request(
+            {"public_id": public_id, "version": version}, "secret"
+        )
+        return {"public_id": public_id, "version": version, "signature": signature, "format": "png"}
+
+    own = upload_response(f"quiz_app_avatars/user_{profile_user_id}")
+    other = upload_response("quiz_app_avatars/user_999")
+    forged = dict(own, signature="0" * 40)
+    non_ascii = dict(own, signature="\u00e9" * 40)
+
+    for payload in (other, forged, non_ascii, dict(own, format="svg")):
+        rejected = logged_in_user.post("/profile/avatar", json=payload)
+        assert rejected.status_code == 400
+
+    accepted = logged_in_user.post("/profile/avatar", json=own)
+    assert accepted.status_code == 200
+
+    expected = (
+        f"https://res.cloudinary.com/test/image/upload/v1712/quiz_app_avatars/"
+        f"user_{profile_user_id}.png"
+    )
+    assert accepted.get_json() == {"avatar": expected}
+    with app.app_context():
+        assert db.session.get(User, profile_user_id).avatar == expected
+
+
 def test_registration_password_mismatch(client):
     """Test registration with non-matching passwords."""
     response = client.post(
@@ -158,13 +189,13 @@ def test_registration_password_mismatch(client):
     assert b"Passwords do not match" in response.data
 
 
-def test_registration_duplicate_email(client, app):
+def test_registration_duplicate_email(client, app, hash_password):
     """Test registration with already-used email."""
     with app.app_context():
         user = User(
             username="existing",
             email="existing@test.com",
-            password_hash=generate_password_hash("Test123!"),
+            password_hash=hash_password("Test123!"),
         )
         db.session.add(user)
         db.session.commit()
@@ -183,17 +214,31 @@ def test_registration_duplicate_email(client, app):
     assert b"Email already registered" in response.data
 
 
-def test_registration_weak_password_production_mode(app):
+def test_registration_uses_configured_hash_method(client, app):
+    """Test new accounts are hashed with PASSWORD_HASH_METHOD."""
+    client.post(
+        "/register",
+        data={
+            "username": "hashmethod",
+            "email": "hash@test.com",
+            "password": "Test123!",
+            "confirm_password": "Test123!",
+        },
+    )
+
+    with app.app_context():
+        user = User.query.filter_by(username="hashmethod").first()
+        assert user.password_hash.startswith(app.config["PASSWORD_HASH_METHOD"] + "$")
+
+
+def test_registration_weak_password_production_mode(make_app):
     """Test password policy enforcement in production mode."""
     # Create non-TESTING app to enable strict password checks
-    prod_app = create_app(
+    prod_app = make_app(
         {"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "WTF_CSRF_ENABLED": False}
     )
     client = prod_app.test_client()
 
-    with prod_app.app_context():
-        db.create_all()
-
     # Password missing uppercase
     response = client.post(
         "/register",
@@ -213,107 +258,69 @@ def test_registration_weak_password_production_mode(app):
     )
 
 
-def test_login_rate_limiting(client, app):
+def test_login_rate_limiting(client, app, flashed_messages, hash_password):
     """Test login rate limiting after multiple failed attempts."""
     with app.app_context():
         user = User(
             username="ratelimit",
             email="rate@test.com",
-            password_hash=generate_password_hash("Correct123!"),
+            password_hash=hash_password("Correct123!"),
         )
         db.session.add(user)
         db.session.commit()
 
-    # Make 5 failed login attempts (threshold)
-    for _ in range(5):
-        client.post("/login", data={"username": "ratelimit", "password": "wrong"})
+    # Record the threshold of recent attempts for the test client's address directly
+    app.extensions["login_attempts"]["127.0.0.1"] = [time.time()] * _LOGIN_MAX
 
-    # 6th attempt should be rate limited
-    response = client.post(
-        "/login", data={"username": "ratelimit", "password": "wrong"}, follow_redirects=True
-    )
+    # Next attempt is rate limited, even with the right password
+    response = client.post("/login", data={"username": "ratelimit", "password": "Correct123!"})
 
-    assert b"Too many login attempts" in response.data
+    assert response.status_code == 302
+    assert any("Too many login attempts" in message for message in flashed_messages())
 
 
-def test_login_missing_credentials(app):
+def test_login_missing_credentials(client, flashed_messages):
     """Test login with missing username or password."""
-    # Clear rate limiter state
-    from routes.auth_routes import _LOGIN_ATTEMPTS
-
-    _LOGIN_ATTEMPTS.clear()
-
-    # Create fresh client without prior rate limiting
-    fresh_app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
-    client = fresh_app.test_client()
-
-    with fresh_app.app_context():
-        db.create_all()
+    response = client.post("/login", data={"username": "", "password": ""})
 
-    response = client.post("/login", data={"username": "", "password": ""}, follow_redirects=True)
-
-    assert response.status_code == 200
-    assert b"Both username and password are required" in response.data
+    assert response.status_code == 302
+    assert "Both username and password are required" in flashed_messages()
 
 
-def test_login_invalid_credentials(app):
+def test_login_invalid_credentials(client, app, hash_password):
     """Test login with wrong password."""
-    # Clear rate limiter state
-    from routes.auth_routes import _LOGIN_ATTEMPTS
-
-    _LOGIN_ATTEMPTS.clear()
-
-    # Create fresh client to avoid rate limiting interference
-    fresh_app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
-    client = fresh_app.test_client()
-
-    with fresh_app.app_context():
-        db.create_all()
+    with app.app_context():
         user = User(
             username="validuser",
             email="valid@test.com",
-            password_hash=generate_password_hash("Correct123!"),
+            password_hash=hash_password("Correct123!"),
         )
         db.session.add(user)
         db.session.commit()
 
-    response = client.post(
-        "/login", data={"username": "validuser", "password": "WrongPassword"}, follow_redirects=True
-    )
+    response = client.post("/login", data={"username": "validuser", "password": "WrongPassword"})
 
     assert b"Invalid username or password" in response.data
 
 
-def test_logout_clears_session(app):
+def test_logout_clears_session(client, app, hash_password):
     """Test that logout properly clears session."""
-    # Clear rate limiter state
-    from routes.auth_routes import _LOGIN_ATTEMPTS
-
-    _LOGIN_ATTEMPTS.clear()
-
-    # Create fresh client to avoid rate limiting
-    fresh_app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
-    client = fresh_app.test_client()
-
-    with fresh_app.app_context():
-        db.create_all()
+    with app.app_context():
         user = User(
             username="logouttest",
             email="logout@test.com",
-            password_hash=generate_password_hash("Test123!"),
+            password_hash=hash_password("Test123!"),
         )
         db.session.add(user)
         db.session.commit()
 
     # Login
-    client.post(
-        "/login", data={"username": "logouttest", "password": "Test123!"}, follow_redirects=True
-    )
+    client.post("/login", data={"username": "logouttest", "password": "Test123!"})
 
     # Verify logged in
     dash_before = client.get("/dashboard")
     assert dash_before.status_code == 200  # Logout
-    client.get("/logout", follow_redirects=True)
+    client.get("/logout")
 
     # Dashboard should now redirect to login
     dash_after = client.get("/dashboard", follow_redirects=False)
@@ -3,8 +3,12 @@ import importlib
 import sys
 import types
 
+import pytest
 
-def test_clear_database_safe(monkeypatch):
+
+@pytest.fixture(scope="module")
+def clear_db_module():
+    """Import clear_database once per module against a fake 'app' module."""
     # Provide a fake 'app' module exposing a Flask app object to satisfy import
     from flask import Flask
 
@@ -22,6 +26,11 @@ def test_clear_database_safe(monkeypatch):
             sys.modules["app"] = original_app_mod
         else:
             del sys.modules["app"]
+    return mod
+
+
+def test_clear_database_safe(monkeypatch, clear_db_module):
+    mod = clear_db_module
 
     # Build fake objects to avoid touching real DB
     class _FakeQuery:
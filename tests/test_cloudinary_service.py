@@ -7,22 +7,33 @@ from unittest.mock import MagicMock, patch
 import pytest
 from werkzeug.datastructures import FileStorage
 
-from app import create_app
 from services.cloudinary_service import (
+    avatar_public_id,
     delete_avatar,
     init_cloudinary,
     is_cloudinary_url,
+    sign_avatar_upload,
     upload_avatar,
 )
 
+_IMAGE_BYTES = b"fake image data"
+
 
 @pytest.fixture
-def app():
-    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
+def app(app):
+    """Run each test inside an app context of the shared session app."""
     with app.app_context():
         yield app
 
 
+@pytest.fixture
+def cloudinary_env(monkeypatch):
+    """Configure Cloudinary credentials for the duration of a test."""
+    monkeypatch.setenv("CLOUDINARY_CLOUD_NAME", "test")
+    monkeypatch.setenv("CLOUDINARY_API_KEY", "key")
+    monkeypatch.setenv("CLOUDINARY_API_SECRET", "secret")
+
+
 def test_is_cloudinary_url_true():
     """Test detection of Cloudinary URLs."""
     assert is_cloudinary_url("https://res.cloudinary.com/mycloud/image/upload/avatar.jpg")
@@ -35,18 +46,10 @@ def test_is_cloudinary_url_false():
     assert not is_cloudinary_url("")
 
 
-def test_init_cloudinary_success():
+def test_init_cloudinary_success(cloudinary_env):
     """Test Cloudinary initialization with valid credentials."""
-    with patch.dict(
-        os.environ,
-        {
-            "CLOUDINARY_CLOUD_NAME": "test_cloud",
-            "CLOUDINARY_API_KEY": "test_key",
-            "CLOUDINARY_API_SECRET": "test_secret",
-        },
-    ):
-        result = init_cloudinary()
-        assert result is True
+    result = init_cloudinary()
+    assert result is True
 
 
 def test_init_cloudinary_missing_credentials():
@@ -57,55 +60,39 @@ def test_init_cloudinary_missing_credentials():
 
 
 @patch("services.cloudinary_service.cloudinary.uploader.upload")
-def test_upload_avatar_to_cloudinary(mock_upload, app):
+def test_upload_avatar_to_cloudinary(mock_upload, app, cloudinary_env):
     """Test avatar upload to Cloudinary when configured."""
     mock_upload.return_value = {"secure_url": "https://res.cloudinary.com/test/avatar.jpg"}
 
-    with patch.dict(
-        os.environ,
-        {
-            "CLOUDINARY_CLOUD_NAME": "test",
-            "CLOUDINARY_API_KEY": "key",
-            "CLOUDINARY_API_SECRET": "secret",
-        },
-    ):
-        file = FileStorage(
-            stream=BytesIO(b"fake image data"), filename="test.jpg", content_type="image/jpeg"
-        )
+    file = FileStorage(stream=BytesIO(_IMAGE_BYTES), filename="test.jpg", content_type="image/jpeg")
 
-        result = upload_avatar(file, user_id=1)
-        assert result == "https://res.cloudinary.com/test/avatar.jpg"
-        mock_upload.assert_called_once()
+    result = upload_avatar(file, user_id=1)
+    assert result == "https://res.cloudinary.com/test/avatar.jpg"
+    mock_upload.assert_called_once()
 
 
-@patch(
-    "services.cloudinary_service.cloudinary.uploader.upload", side_effect=Exception("Upload failed")
-)
-def test_upload_avatar_cloudinary_fallback_to_local(mock_upload, app):
-    """Test fallback to local storage when Cloudinary upload fails."""
-    with patch.dict(
-        os.environ,
-        {
-            "CLOUDINARY_CLOUD_NAME": "test",
-            "CLOUDINARY_API_KEY": "key",
-            "CLOUDINARY_API_SECRET": "secret",
-        },
-    ):
-        file = FileStorage(
-            stream=BytesIO(b"fake image data"), filename="test.jpg", content_type="image/jpeg"
-        )
+def test_upload_avatar_cloudinary_fallback_to_local(tmp_static, cloudinary_env):
+    """Test fallback to local storage when Cloudinary upload fails after reading the file."""
+    file = FileStorage(stream=BytesIO(_IMAGE_BYTES), filename="test.jpg", content_type="image/jpeg")
 
+    # Fail at the HTTP layer so the real SDK consumes the stream before raising
+    with patch(
+        "cloudinary.uploader._http.request", side_effect=Exception("Upload failed")
+    ) as mock_request:
         result = upload_avatar(file, user_id=1)
-        # Should return local path after fallback
-        assert result.startswith("uploads/user_1_")
-        assert result.endswith(".jpg")
+
+    mock_request.assert_called_once()
+    # Should return local path after fallback, with the complete file saved
+    assert result.startswith("uploads/user_1_")
+    assert result.endswith(".jpg")
+    assert (tmp_static / result).read_bytes() == _IMAGE_BYTES
 
 
-def test_upload_avatar_local_storage(app):
+def test_upload_avatar_local_storage(tmp_static):
     """Test direct upload to local storage when Cloudinary not configured."""
     with patch.dict(os.environ, {}, clear=True):
         file = FileStorage(
-            stream=BytesIO(b"fake image data"), filename="avatar.png", content_type="image/png"
+            stream=BytesIO(_IMAGE_BYTES), filename="avatar.png", content_type="image/png"
         )
 
         result = upload_avatar(file, user_id=42)
@@ -113,48 +100,86 @@ def test_upload_avatar_local_storage(app):
         assert result.endswith(".png")
 
         # Verify file was saved
-        full_path = os.path.join(app.static_folder, result)
-        assert os.path.exists(full_path)
-
-        # Cleanup
-        try:
-            os.remove(full_path)
-        except Exception:
-            pass
+        assert (tmp_static / result).read_bytes() == _IMAGE_BYTES
 
 
 @patch("services.cloudinary_service.cloudinary.uploader.destroy")
-def test_delete_cloudinary_avatar(mock_destroy, app):
+def test_delete_cloudinary_avatar(mock_destroy, app, cloudinary_env):
     """Test deletion of Cloudinary avatar."""
-    with patch.dict(
-        os.environ,
-        {
-            "CLOUDINARY_CLOUD_NAME": "test",
-            "CLOUDINARY_API_KEY": "key",
-            "CLOUDINARY_API_SECRET": "secret",
-        },
-    ):
-        url = "https://res.cloudinary.com/test/image/upload/v123/quiz_app_avatars/user_1.jpg"
-        result = delete_avatar(url)
-        assert result is True
-        mock_destroy.assert_called_once_with("quiz_app_avatars/user_1")
-
-
-def test_delete_local_avatar(app):
+    url = "https://res.cloudinary.com/test/image/upload/v123/quiz_app_avatars/user_1.jpg"
+    result = delete_avatar(url)
+    assert result is True
+    mock_destroy.assert_called_once_with("quiz_app_avatars/user_1")
+
+
+@patch("services.cloudinary_service.cloudinary.uploader.destroy")
+def test_delete_cloudinary_avatar_unversioned_and_foreign(mock_destroy, app, cloudinary_env):
+    """Test public_id extraction without a version segment and rejection of other folders."""
+    url = "https://res.cloudinary.com/test/image/upload/quiz_app_avatars/user_7.png"
+    assert delete_avatar(url) is True
+    mock_destroy.assert_called_once_with("quiz_app_avatars/user_7")
+
+    mock_destroy.reset_mock()
+    other = "https://res.cloudinary.com/test/image/upload/v1/other_folder/user_7.png"
+    assert delete_avatar(other) is False
+    mock_destroy.assert_not_called()
+
+
+def test_avatar_public_id_requires_configured_cloud_and_exact_url(cloudinary_env):
+    """Test only complete avatar URLs on the configured cloud yield a public_id."""
+    base = "https://res.cloudinary.com/{}/image/upload/v1/quiz_app_avatars/user_7{}"
+    assert avatar_public_id(base.format("test", ".png")) == "user_7"
+    assert avatar_public_id(base.format("test", "")) == "user_7"
+    # Another Cloudinary account's image with the same folder and public_id
+    assert avatar_public_id(base.format("attacker", ".png")) is None
+    # Trailing path or query after the public_id
+    assert avatar_public_id(base.format("test", ".png/../../evil.png")) is None
+    assert avatar_public_id(base.format("test", "/extra")) is None
+    assert avatar_public_id(base.format("test", ".png?x=1")) is None
+
+
+def test_delete_local_avatar(tmp_static):
     """Test deletion of local avatar file."""
     # Create a dummy file
     test_path = "uploads/test_avatar_delete.png"
-    full_path = os.path.join(app.static_folder, test_path)
-    os.makedirs(os.path.dirname(full_path), exist_ok=True)
-
-    with open(full_path, "w") as f:
-        f.write("test")
-
-    assert os.path.exists(full_path)
+    full_path = tmp_static / test_path
+    full_path.parent.mkdir()
+    full_path.write_bytes(b"test")
 
     result = delete_avatar(test_path)
     assert result is True
-    assert not os.path.exists(full_path)
+    assert not full_path.exists()
+
+
+def test_sign_avatar_upload_not_configured():
+    """Test signing returns None when Cloudinary credentials are missing."""
+    with patch.dict(os.environ, {}, clear=True):
+        assert sign_avatar_upload(1) is None
+
+
+def test_sign_avatar_upload_signature(cloudinary_env):
+    """Test signed params match Cloudinary's signing of the same fields."""
+    import cloudinary.utils
+
+    params = sign_avatar_upload(7)
+
+    assert params["public_id"] == "user_7"
+    assert params["folder"] == "quiz_app_avatars"
+    assert params["api_key"] == "key"
+    assert params["upload_url"] == "https://api.cloudinary.com/v1_1/test/image/upload"
+    assert params["allowed_formats"] == "gif,jpeg,jpg,png"
+    signed = {
+        k: params[k]
+        for k in (
+            "folder",
+            "public_id",
+            "overwrite",
+            "timestamp",
+            "transformation",
+            "allowed_formats",
+        )
+    }
+    assert params["signature"] == cloudinary.utils.api_sign_request(signed, "secret")
 
 
 def test_delete_avatar_none():
@@ -162,8 +187,7 @@ def test_delete_avatar_none():
     assert delete_avatar(None) is False
 
 
-def test_delete_avatar_nonexistent_local():
+def test_delete_avatar_nonexistent_local(app):
     """Test deletion of non-existent local file returns False."""
-    with create_app({"TESTING": True}).app_context():
-        result = delete_avatar("uploads/nonexistent.png")
-        assert result is False
+    result = delete_avatar("uploads/nonexistent.png")
+    assert result is False
@@ -1,47 +1,44 @@
 """Additional tests to cover quiz explanation branch and streak updates."""
 
+import copy
+import time
 from datetime import date, timedelta
-from unittest.mock import patch
 
 import pytest
-from werkzeug.security import generate_password_hash
 
-from app import create_app
 from models import User, db
 
 
-@pytest.fixture
-def app():
-    app = create_app(
-        {
-            "TESTING": True,
-            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
-            "WTF_CSRF_ENABLED": False,
-        }
-    )
-    with app.app_context():
-        db.create_all()
-        yield app
-
-
-@pytest.fixture
-def client(app):
-    return app.test_client()
-
-
 def _start_basic_quiz(client, username="guest1"):
     # Kick off a quiz to populate session with questions
     resp = client.post(
         "/quiz",
         data={"quiz_type": "General Knowledge", "username": username, "difficulty": "medium"},
-        follow_redirects=True,
     )
-    assert resp.status_code == 200
+    assert resp.status_code in (302, 303)
+
+
+@pytest.fixture(scope="module")
+def quiz_state(app):
+    """Start one guest quiz for the module and return a copy of its session."""
+    c = app.test_client()
+    _start_basic_quiz(c)
+    with c.session_transaction() as sess:
+        return copy.deepcopy(dict(sess))
+
+
+@pytest.fixture
+def started_quiz(client, quiz_state):
+    """Load the module's started quiz into ``client``'s session with a fresh timer."""
+    with client.session_transaction() as sess:
+        sess.update(copy.deepcopy(quiz_state))
+        sess["quiz_started_at"] = int(time.time())
+    return client
 
 
-def test_explanation_branch_renders_and_holds_index(client):
+def test_explanation_branch_renders_and_holds_index(started_quiz):
     """Posting with show_explanation should render explanation and not advance the index."""
-    _start_basic_quiz(client)
+    client = started_quiz
 
     # Get current index and an answer option
     with client.session_transaction() as sess:
@@ -56,29 +53,36 @@ def test_explanation_branch_renders_and_holds_index(client):
         "/question", data={"answer": selected, "show_explanation": "true"}, follow_redirects=True
     )
     assert r.status_code == 200
-    html = r.get_data(as_text=True)
+    data = r.get_data()
     # Expect explanation UI elements
-    assert "explanation-box" in html
-    assert "Continue" in html and "Submit Answer" not in html
+    assert b"explanation-box" in data
+    assert b"Continue" in data and b"Submit Answer" not in data
 
     # Ensure index did not advance
     with client.session_transaction() as sess:
         assert sess.get("current_index", 0) == idx
 
 
-@pytest.fixture
-def logged_in_client(app):
+@pytest.fixture(scope="module")
+def logged_in_client(app, hash_password):
+    """Create and log in the streak user once for every test in the module."""
     with app.app_context():
-        u = User(
-            username="streaker",
-            email="streak@test.com",
-            password_hash=generate_password_hash("Test123!"),
+        inserted = db.session.execute(
+            db.insert(User).values(
+                username="streaker",
+                email="streak@test.com",
+                password_hash=hash_password("Test123!"),
+            )
         )
-        db.session.add(u)
         db.session.commit()
+        user_id = inserted.inserted_primary_key[0]
     c = app.test_client()
-    c.post("/login", data={"username": "streaker", "password": "Test123!"}, follow_redirects=True)
-    return c
+    resp = c.post("/login", data={"username": "streaker", "password": "Test123!"})
+    assert resp.status_code in (302, 303)
+    yield c
+    with app.app_context():
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
 
 
 def _set_result_session(c, category_label):
@@ -90,60 +94,45 @@ def _set_result_session(c, category_label):
         sess["quiz_category"] = category_label
 
 
-def test_streak_updates_across_days(logged_in_client, app):
+def test_streak_updates_across_days(logged_in_client, db_session, monkeypatch):
     """Verify streak increments for consecutive days, holds for same-day, and resets after a gap."""
-    with app.app_context():
-        user = User.query.filter_by(username="streaker").first()
-        # Start with no last_quiz_date
-        user.last_quiz_date = None
-        user.current_streak = 0
-        user.longest_streak = 0
-        db.session.commit()
+    # db_session keeps one app context open, so the requests below share it and its session
+    user = User.query.filter_by(username="streaker").first()
+    # Start with no last_quiz_date
+    user.last_quiz_date = None
+    user.current_streak = 0
+    user.longest_streak = 0
+    db.session.commit()
 
     # First result: should set streak to 1
     _set_result_session(logged_in_client, "General D1")
     resp1 = logged_in_client.get("/result")
     assert resp1.status_code == 200
-    with app.app_context():
-        user = User.query.filter_by(username="streaker").first()
-        assert user.current_streak == 1
-        assert user.longest_streak >= 1
-        assert user.last_quiz_date == date.today()
+    db.session.refresh(user)
+    assert user.current_streak == 1
+    assert user.longest_streak >= 1
+    assert user.last_quiz_date == date.today()
 
     # Same-day repeat: should keep streak unchanged
     _set_result_session(logged_in_client, "General SameDay")
     resp_same = logged_in_client.get("/result")
     assert resp_same.status_code == 200
-    with app.app_context():
-        user = User.query.filter_by(username="streaker").first()
-        assert user.current_streak == 1
+    db.session.refresh(user)
+    assert user.current_streak == 1
 
     # Pretend it's tomorrow so yesterday is considered consecutive
-    class _FakeDate(date):
-        @classmethod
-        def today(cls):
-            return date.today() + timedelta(days=1)
-
     _set_result_session(logged_in_client, "General D2")
-    with patch("routes.result_routes.date", _FakeDate):
-        resp2 = logged_in_client.get("/result")
+    monkeypatch.setattr("routes.result_routes._today", lambda: date.today() + timedelta(days=1))
+    resp2 = logged_in_client.get("/result")
     assert resp2.status_code == 200
-    with app.app_context():
-        user = User.query.filter_by(username="streaker").first()
-        assert user.current_streak >= 2
-        assert user.longest_streak >= 2
+    db.session.refresh(user)
+    assert user.current_streak >= 2
+    assert user.longest_streak >= 2
 
     # Gap of several days: move 'today' forward 5 days to reset streak
     _set_result_session(logged_in_client, "General Gap")
-
-    class _FakeDate2(date):
-        @classmethod
-        def today(cls):
-            return date.today() + timedelta(days=5)
-
-    with patch("routes.result_routes.date", _FakeDate2):
-        resp3 = logged_in_client.get("/result")
+    monkeypatch.setattr("routes.result_routes._today", lambda: date.today() + timedelta(days=5))
+    resp3 = logged_in_client.get("/result")
     assert resp3.status_code == 200
-    with app.app_context():
-        user = User.query.filter_by(username="streaker").first()
-        assert user.current_streak == 1
+    db.session.refresh(user)
+    assert user.current_streak == 1
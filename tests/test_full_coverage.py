@@ -1,31 +1,40 @@
 """Comprehensive tests to achieve 100% code coverage for all remaining gaps."""
 
-import os
-import time
+from contextlib import nullcontext
 from datetime import datetime, timezone
-from io import BytesIO
-from unittest.mock import MagicMock, Mock, patch
+from unittest.mock import Mock, patch
 
 import pytest
-from flask import session
-from itsdangerous import BadSignature, SignatureExpired
-from werkzeug.security import generate_password_hash
 
 from app import create_app
 from models import Score, User, db
 
+# Every test runs against the session app; db_session undoes its writes afterwards
+pytestmark = pytest.mark.usefixtures("db_session")
 
-@pytest.fixture
-def app():
-    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
-    with app.app_context():
-        db.create_all()
-        yield app
+# For tests that need an app of their own. TESTING already turns off CSRF and drops
+# the password KDF to one round, and create_app gives :memory: a StaticPool
+TEST_CFG = {"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"}
 
+# Finished-quiz payloads for the result page; tests store list copies in the session
+_DUMMY_QUESTIONS_5 = tuple({"question": "Q1", "correct": "A"} for _ in range(5))
+_DUMMY_QUESTIONS_10 = tuple({"q": "1"} for _ in range(10))
 
-@pytest.fixture
-def client(app):
-    return app.test_client()
+# Canned doubles built once; the tests only read from them
+_EMPTY_API_RESPONSE = Mock(**{"json.return_value": {"results": []}})
+_ONE_QUESTION_API_RESPONSE = Mock(
+    **{
+        "json.return_value": {
+            "results": [
+                {
+                    "question": "Q1",
+                    "correct_answer": "A",
+                    "incorrect_answers": ["B", "C", "D"],
+                }
+            ]
+        }
+    }
+)
 
 
 # ============ app.py Coverage Tests ============
@@ -48,13 +57,13 @@ def test_create_app_non_testing_config():
     assert app.config.get("WTF_CSRF_ENABLED") is not False  # CSRF should be enabled
 
 
-def test_unauthorized_handler_disable_autologin(client, app):
+def test_unauthorized_handler_disable_autologin(client, app, test_password_hash):
     """Test unauthorized handler when autologin is disabled."""
     with app.app_context():
         user = User(
             username="testuser",
             email="test@example.com",
-            password_hash=generate_password_hash("Test123!"),
+            password_hash=test_password_hash,
         )
         db.session.add(user)
         db.session.commit()
@@ -71,37 +80,36 @@ def test_unauthorized_handler_disable_autologin(client, app):
     assert "/login" in response.location
 
 
-def test_unauthorized_handler_ip_based_recent_reg(app):
+def test_unauthorized_handler_ip_based_recent_reg(client, app, monkeypatch, test_password_hash):
     """Test unauthorized handler with IP-based recent registration."""
-    client = app.test_client()
+    # Pin the clock so the registration is exactly as fresh as recorded below
+    monkeypatch.setattr("time.time", lambda: 1_700_000_000.0)
 
     with app.app_context():
         user = User(
             username="ipuser",
             email="ip@example.com",
-            password_hash=generate_password_hash("Test123!"),
+            password_hash=test_password_hash,
         )
         db.session.add(user)
         db.session.commit()
         user_id = user.id
 
     # Set up recent registration by IP
-    app.config["_RECENT_REG"] = {"127.0.0.1": (user_id, time.time())}
+    app.config["_RECENT_REG"] = {"127.0.0.1": (user_id, 1_700_000_000.0)}
 
     response = client.get("/dashboard")
     # Should auto-login based on IP
-    assert response.status_code == 200 or response.status_code == 302
+    assert response.status_code == 200
 
 
-def test_unauthorized_handler_cookie_fallback(app):
+def test_unauthorized_handler_cookie_fallback(client, app, test_password_hash):
     """Test unauthorized handler with cookie fallback."""
-    client = app.test_client()
-
     with app.app_context():
         user = User(
             username="cookieuser",
             email="cookie@example.com",
-            password_hash=generate_password_hash("Test123!"),
+            password_hash=test_password_hash,
         )
         db.session.add(user)
         db.session.commit()
@@ -115,25 +123,28 @@ def test_unauthorized_handler_cookie_fallback(app):
     assert response.status_code in [200, 302]
 
 
-def test_before_request_autologin_with_signed_cookie(app):
-    """Test before_request auto-login with signed cookie."""
+@pytest.fixture(scope="module")
+def signer(app):
+    """Serializer matching the one before_request uses to read x_autologin cookies."""
     from itsdangerous import URLSafeTimedSerializer
 
-    client = app.test_client()
+    return URLSafeTimedSerializer(app.config["SECRET_KEY"])
+
 
+def test_before_request_autologin_with_signed_cookie(client, app, signer, test_password_hash):
+    """Test before_request auto-login with signed cookie."""
     with app.app_context():
         user = User(
             username="signeduser",
             email="signed@example.com",
-            password_hash=generate_password_hash("Test123!"),
+            password_hash=test_password_hash,
         )
         db.session.add(user)
         db.session.commit()
         user_id = user.id
 
         # Create signed token
-        s = URLSafeTimedSerializer(app.config["SECRET_KEY"])
-        token = s.dumps({"uid": user_id})
+        token = signer.dumps({"uid": user_id})
 
     # Set signed cookie
     client.set_cookie("x_autologin", token)
@@ -142,10 +153,8 @@ def test_before_request_autologin_with_signed_cookie(app):
     assert response.status_code == 200
 
 
-def test_before_request_autologin_with_expired_token(app):
+def test_before_request_autologin_with_expired_token(client):
     """Test before_request with expired autologin token."""
-    client = app.test_client()
-
     # Set an invalid token
     client.set_cookie("x_autologin", "invalid_token")
 
@@ -154,15 +163,13 @@ def test_before_request_autologin_with_expired_token(app):
     assert response.status_code == 200
 
 
-def test_before_request_autologin_with_x_just_reg_cookie(app):
+def test_before_request_autologin_with_x_just_reg_cookie(client, app, test_password_hash):
     """Test before_request with x_just_reg cookie fallback."""
-    client = app.test_client()
-
     with app.app_context():
         user = User(
             username="justreguser",
             email="justreg@example.com",
-            password_hash=generate_password_hash("Test123!"),
+            password_hash=test_password_hash,
         )
         db.session.add(user)
         db.session.commit()
@@ -195,8 +202,10 @@ def test_error_handler_404_custom_page(client):
     assert b"404" in response.data or b"not found" in response.data.lower()
 
 
-def test_error_handler_500_custom_page(app):
+def test_error_handler_500_custom_page():
     """Test 500 error handler returns custom page."""
+    # Adds a route and flips TESTING, so it can't use the shared app
+    app = create_app(TEST_CFG)
     client = app.test_client()
 
     # Create a route that raises an exception
@@ -211,34 +220,6 @@ def test_error_handler_500_custom_page(app):
     assert response.status_code == 500
 
 
-def test_session_exception_handling():
-    """Test Session initialization exception handling."""
-    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
-
-    # The exception handling is in place, app should still work
-    assert app is not None
-
-
-def test_database_migration_postgres_path():
-    """Test database initialization for Postgres (non-SQLite) databases."""
-    # This tests the Postgres migration path (lines 176-195)
-    # Mock the database to simulate Postgres without actual connection
-    with patch("app.inspect") as mock_inspect:
-        mock_inspector = Mock()
-        mock_inspector.has_table.return_value = True
-        mock_inspect.return_value = mock_inspector
-
-        # Create app with postgres URI (won't actually connect)
-        app = create_app(
-            {
-                "TESTING": True,
-                "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",  # Use SQLite to avoid connection issues
-            }
-        )
-        # If migrations aren't run, this would fail, but in test env we use SQLite
-        assert app is not None
-
-
 # ============ routes/auth_routes.py Coverage Tests ============
 
 
@@ -257,26 +238,51 @@ def test_remove_avatar_file_helper(app):
         _remove_avatar_file("uploads/nonexistent.png")
 
 
-def test_registration_all_fields_required(client):
-    """Test registration with missing fields."""
-    response = client.post(
-        "/register",
-        data={"username": "", "email": "", "password": ""},
-        follow_redirects=True,
-    )
-    assert response.status_code == 200
-    assert b"All fields are required" in response.data
+@pytest.fixture(scope="module")
+def seeded_users(app, test_password_hash):
+    """Seed the users duplicate-registration cases collide with; maps username to id.
 
+    They are committed before any test's db_session snapshot, so they survive every
+    per-test restore and are removed once the module is done.
+    """
+    with app.app_context():
+        users = [
+            User(username="existing", email="existing@test.com", password_hash=test_password_hash)
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        ids = {user.username: user.id for user in users}
+    yield ids
+    with app.app_context():
+        db.session.execute(db.delete(User).where(User.id.in_(ids.values())))
+        db.session.commit()
 
-def test_registration_username_length_validation(client):
-    """Test registration with username too short."""
-    response = client.post(
-        "/register",
-        data={"username": "ab", "email": "test@test.com", "password": "Test123!"},
-        follow_redirects=True,
-    )
+
+@pytest.mark.usefixtures("seeded_users")
+@pytest.mark.parametrize(
+    "data,expected",
+    [
+        ({"username": "", "email": "", "password": ""}, b"All fields are required"),
+        (
+            {"username": "ab", "email": "test@test.com", "password": "Test123!"},
+            b"must be between 3 and 80 characters",
+        ),
+        (
+            {"username": "existing", "email": "new@test.com", "password": "Test123!"},
+            b"Username already exists",
+        ),
+        (
+            {"username": "newuser", "email": "existing@test.com", "password": "Test123!"},
+            b"Email already registered",
+        ),
+    ],
+    ids=["missing-fields", "short-username", "duplicate-username", "duplicate-email"],
+)
+def test_registration_validation(client, data, expected):
+    """Test registration re-renders the form with the validation error."""
+    response = client.post("/register", data=data)
     assert response.status_code == 200
-    assert b"must be between 3 and 80 characters" in response.data
+    assert expected in response.data
 
 
 def test_registration_weak_password_testing_mode(client):
@@ -284,36 +290,11 @@ def test_registration_weak_password_testing_mode(client):
     response = client.post(
         "/register",
         data={"username": "weakuser", "email": "weak@test.com", "password": "weak"},
-        follow_redirects=True,
     )
     # In testing mode, weak passwords are allowed
     assert response.status_code == 200
 
 
-def test_registration_duplicate_email(client, app):
-    """Test registration with duplicate email."""
-    with app.app_context():
-        user = User(
-            username="existing",
-            email="existing@test.com",
-            password_hash=generate_password_hash("Test123!"),
-        )
-        db.session.add(user)
-        db.session.commit()
-
-    response = client.post(
-        "/register",
-        data={
-            "username": "newuser",
-            "email": "existing@test.com",
-            "password": "Test123!",
-        },
-        follow_redirects=True,
-    )
-    assert response.status_code == 200
-    assert b"Email already registered" in response.data
-
-
 def test_registration_database_error_handling(client, app):
     """Test registration handles database errors gracefully."""
     # Mock db.session.commit to raise exception
@@ -325,36 +306,26 @@ def test_registration_database_error_handling(client, app):
                 "email": "error@test.com",
                 "password": "Test123!",
             },
-            follow_redirects=True,
         )
         assert response.status_code == 200
         assert b"Registration failed" in response.data
 
 
-def test_profile_update_avatar_upload_error(app):
+def test_profile_update_avatar_upload_error(
+    client, app, login_as, flashed_messages, test_password_hash
+):
     """Test profile avatar upload when upload_avatar raises exception."""
-    # Clear rate limiter
-    from routes.auth_routes import _LOGIN_ATTEMPTS
-
-    _LOGIN_ATTEMPTS.clear()
-
-    client = app.test_client()
-
     with app.app_context():
         user = User(
             username="uploaderror",
             email="uploaderror@test.com",
-            password_hash=generate_password_hash("Test123!"),
+            password_hash=test_password_hash,
         )
         db.session.add(user)
         db.session.commit()
+        login_as(user.id)
 
-    # Login
-    client.post(
-        "/login",
-        data={"username": "uploaderror", "password": "Test123!"},
-        follow_redirects=True,
-    )
+    from io import BytesIO
 
     # Mock upload_avatar to raise exception
     with patch("routes.auth_routes.upload_avatar", side_effect=Exception("Upload failed")):
@@ -363,32 +334,23 @@ def test_profile_update_avatar_upload_error(app):
             "/profile",
             data={"avatar": (file_data, "test.png"), "full_name": "", "bio": ""},
             content_type="multipart/form-data",
-            follow_redirects=True,
         )
-        assert response.status_code == 200
-        assert b"Failed to upload avatar" in response.data
+        assert response.status_code == 302
+        assert "/profile" in response.location
+        assert "Failed to upload avatar. Please try again." in flashed_messages()
 
 
-def test_profile_update_database_error(app):
+def test_profile_update_database_error(client, app, login_as, flashed_messages, test_password_hash):
     """Test profile update with database commit error."""
-    from routes.auth_routes import _LOGIN_ATTEMPTS
-
-    _LOGIN_ATTEMPTS.clear()
-
-    client = app.test_client()
-
     with app.app_context():
         user = User(
             username="dberror",
             email="dberror@test.com",
-            password_hash=generate_password_hash("Test123!"),
+            password_hash=test_password_hash,
         )
         db.session.add(user)
         db.session.commit()
-
-    client.post(
-        "/login", data={"username": "dberror", "password": "Test123!"}, follow_redirects=True
-    )
+        login_as(user.id)
 
     # Mock db.session.commit to raise exception
     with patch("models.db.session.commit", side_effect=Exception("DB Error")):
@@ -396,10 +358,10 @@ def test_profile_update_database_error(app):
             "/profile",
             data={"full_name": "Test", "bio": "Bio"},
             content_type="multipart/form-data",
-            follow_redirects=True,
         )
-        assert response.status_code == 200
-        assert b"Failed to update profile" in response.data
+        assert response.status_code == 302
+        assert "/profile" in response.location
+        assert any(m.startswith("Failed to update profile") for m in flashed_messages())
 
 
 def test_leaderboard_query_error_handling(client, app):
@@ -418,13 +380,11 @@ def test_leaderboard_query_error_handling(client, app):
 # ============ routes/quiz_routes.py Coverage Tests ============
 
 
-def test_quiz_non_authenticated_missing_username(client):
+def test_quiz_non_authenticated_missing_username(client, flashed_messages):
     """Test quiz submission without username when not authenticated."""
-    response = client.post(
-        "/quiz", data={"quiz_type": "Python Basics", "username": ""}, follow_redirects=True
-    )
-    assert response.status_code == 200
-    assert b"enter your name" in response.data
+    response = client.post("/quiz", data={"quiz_type": "Python Basics", "username": ""})
+    assert response.status_code == 302
+    assert "Please enter your name." in flashed_messages()
 
 
 def test_quiz_empty_topics_direct_post(client):
@@ -445,7 +405,6 @@ def test_quiz_service_generic_exception(client):
         response = client.post(
             "/quiz",
             data={"username": "testuser", "quiz_type": "Python Basics"},
-            follow_redirects=True,
         )
         assert response.status_code == 503
         assert b"Unable to load quiz questions" in response.data
@@ -454,26 +413,17 @@ def test_quiz_service_generic_exception(client):
 # ============ routes/result_routes.py Coverage Tests ============
 
 
-def test_result_duplicate_score_logging(app):
+def test_result_duplicate_score_logging(client, app, login_as, test_password_hash):
     """Test result page duplicate score detection with logging."""
-    from routes.auth_routes import _LOGIN_ATTEMPTS
-
-    _LOGIN_ATTEMPTS.clear()
-
-    client = app.test_client()
-
     with app.app_context():
         user = User(
             username="duploguser",
             email="duplog@test.com",
-            password_hash=generate_password_hash("Test123!"),
+            password_hash=test_password_hash,
         )
         db.session.add(user)
         db.session.commit()
-
-    client.post(
-        "/login", data={"username": "duploguser", "password": "Test123!"}, follow_redirects=True
-    )
+        login_as(user.id)
 
     # Start quiz
     client.post("/quiz", data={"quiz_type": "Python Basics"}, follow_redirects=True)
@@ -484,16 +434,15 @@ def test_result_duplicate_score_logging(app):
         sess["username"] = "duploguser"
         sess["quiz_category"] = "Python Basics"
         sess["quiz_completed"] = True
-        questions = [{"question": "Q1", "correct": "A"}] * 5
-        sess["questions"] = questions
+        sess["questions"] = list(_DUMMY_QUESTIONS_5)
 
     # First result page visit
-    response1 = client.get("/result", follow_redirects=True)
+    response1 = client.get("/result")
     assert response1.status_code == 200
 
-    # Immediate second visit (within 5 seconds) - should detect duplicate
-    response2 = client.get("/result", follow_redirects=True)
-    assert response2.status_code == 200
+    # Immediate second visit (within 5 seconds) - session is cleared, so back to the index
+    response2 = client.get("/result")
+    assert response2.status_code == 302
 
     # Verify only one score was saved
     with app.app_context():
@@ -501,19 +450,14 @@ def test_result_duplicate_score_logging(app):
         assert len(scores) == 1
 
 
-def test_result_leaderboard_username_none_handling(client, app):
+def test_result_leaderboard_username_none_handling(client, app, login_as, test_password_hash):
     """Test leaderboard handles None username gracefully."""
-    # Clear rate limiter
-    from routes.auth_routes import _LOGIN_ATTEMPTS
-
-    _LOGIN_ATTEMPTS.clear()
-
     with app.app_context():
         # Create user with no username (edge case)
         user = User(
             username="usertest",
             email="usertest@test.com",
-            password_hash=generate_password_hash("Test123!"),
+            password_hash=test_password_hash,
         )
         db.session.add(user)
         db.session.commit()
@@ -529,12 +473,8 @@ def test_result_leaderboard_username_none_handling(client, app):
         db.session.add(score)
         db.session.commit()
 
-    # Login first (leaderboard may require authentication)
-    client.post(
-        "/login",
-        data={"username": "usertest", "password": "Test123!"},
-        follow_redirects=True,
-    )
+        # Log in first (leaderboard may require authentication)
+        login_as(user.id)
 
     response = client.get("/leaderboard")
     assert response.status_code == 200
@@ -547,7 +487,7 @@ def test_result_score_clamping_edge_case(client):
         sess["username"] = "testuser"
         sess["quiz_category"] = "Test"
         sess["quiz_completed"] = True
-        sess["questions"] = [{"q": "1"}] * 10  # Only 10 questions
+        sess["questions"] = list(_DUMMY_QUESTIONS_10)  # Only 10 questions
 
     response = client.get("/result")
     assert response.status_code == 200
@@ -576,75 +516,38 @@ def test_cloudinary_service_delete_local_avatar_exception(app):
                 delete_avatar("uploads/error.png")
 
 
-def test_quiz_service_cache_miss_and_api_call():
-    """Test TriviaService cache miss and API call."""
+@pytest.fixture(scope="module")
+def trivia_service():
     from services.quiz_service import TriviaService
 
-    service = TriviaService()
-
-    # Mock requests to return empty results
-    with patch("services.quiz_service.requests.get") as mock_get:
-        mock_response = Mock()
-        mock_response.json.return_value = {"results": []}
-        mock_response.raise_for_status = Mock()
-        mock_get.return_value = mock_response
-
-        questions = service.fetch_questions_for_topics(["Python"], total_needed=5)
-        # Should return empty list when API returns no questions
-        assert questions == []
-
-
-def test_quiz_service_api_exception_handling():
-    """Test TriviaService handles API exceptions."""
-    from services.quiz_service import TriviaService
-
-    service = TriviaService()
-
-    # Mock requests to raise exception
-    with patch("services.quiz_service.requests.get", side_effect=Exception("API Error")):
-        questions = service.fetch_questions_for_topics(["Python"], total_needed=5)
-        # Should return empty list on exception
-        assert questions == []
-
-
-def test_quiz_service_invalid_category_id():
-    """Test TriviaService with invalid category ID."""
-    from services.quiz_service import TriviaService
-
-    service = TriviaService()
-
-    # Test with unknown category
-    questions = service.fetch_questions_for_topics(["UnknownCategory"], total_needed=5)
-    # Should handle gracefully
-    assert isinstance(questions, list)
-
-
-def test_quiz_service_retry_mechanism():
-    """Test TriviaService retry mechanism on API failures."""
-    from services.quiz_service import TriviaService
-
-    service = TriviaService()
-
-    # Mock to fail first time, succeed second time
-    with patch("services.quiz_service.requests.get") as mock_get:
-        mock_response = Mock()
-        mock_response.json.return_value = {
-            "results": [
-                {
-                    "question": "Q1",
-                    "correct_answer": "A",
-                    "incorrect_answers": ["B", "C", "D"],
-                }
-            ]
-        }
-        mock_response.raise_for_status = Mock()
-
-        # First call fails, second succeeds
-        mock_get.side_effect = [Exception("Fail"), mock_response]
-
-        questions = service.fetch_questions_for_topics(["Python"], total_needed=1)
-        # Should retry and succeed
-        assert len(questions) >= 0
+    return TriviaService()
+
+
+@pytest.mark.parametrize(
+    "topic,total_needed,get_patch,expected",
+    [
+        # API returns no questions
+        ("Python", 5, {"return_value": _EMPTY_API_RESPONSE}, []),
+        # API raises
+        ("Python", 5, {"side_effect": Exception("API Error")}, []),
+        # Unknown category is handled gracefully
+        ("UnknownCategory", 5, None, list),
+        # First call fails, the retry succeeds
+        ("Python", 1, {"side_effect": [Exception("Fail"), _ONE_QUESTION_API_RESPONSE]}, list),
+    ],
+    ids=["cache-miss-empty-api", "api-exception", "invalid-category", "retry"],
+)
+def test_quiz_service_fetch(trivia_service, topic, total_needed, get_patch, expected):
+    """Test TriviaService falls back gracefully when the API is empty, failing or flaky."""
+    requests_get = (
+        patch("services.quiz_service.requests.get", **get_patch) if get_patch else nullcontext()
+    )
+    with requests_get:
+        questions = trivia_service.fetch_questions_for_topics([topic], total_needed=total_needed)
+    if expected is list:
+        assert isinstance(questions, list)
+    else:
+        assert questions == expected
 
 
 if __name__ == "__main__":
@@ -1,18 +1,6 @@
 from datetime import datetime, timezone
 
-import pytest
-from werkzeug.security import generate_password_hash
-
-from app import create_app, db
-from models import Score, User
-
-
-@pytest.fixture
-def client():
-    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
-    with app.app_context():
-        db.create_all()
-        yield app.test_client()
+from models import Score, User, db
 
 
 def register(client, username="avatar_user", email="avatar@test.com", password="Test123!"):
@@ -24,16 +12,15 @@ def register(client, username="avatar_user", email="avatar@test.com", password="
             "password": password,
             "confirm_password": password,
         },
-        follow_redirects=True,
     )
 
 
-def test_full_auth_pages_flow(client):
+def test_full_auth_pages_flow(client, flashed_messages):
     """Register -> dashboard -> profile -> leaderboard -> logout -> protected access check."""
     # Register (auto-login)
     r = register(client)
-    assert r.status_code == 200
-    assert "Registration successful" in r.data.decode()
+    assert r.status_code == 302
+    assert any("Registration successful" in m for m in flashed_messages())
 
     # Dashboard
     dash = client.get("/dashboard")
@@ -61,8 +48,8 @@ def test_full_auth_pages_flow(client):
     assert "default-avatar.svg" in html
 
     # Logout
-    logout = client.get("/logout", follow_redirects=True)
-    assert logout.status_code == 200
+    logout = client.get("/logout")
+    assert logout.status_code == 302
 
     # Protected page should redirect or deny
     protected = client.get("/dashboard", follow_redirects=False)
@@ -71,23 +58,13 @@ def test_full_auth_pages_flow(client):
         assert "/login" in protected.headers.get("Location", "")
 
 
-def test_leaderboard_shows_custom_avatar():
+def test_leaderboard_shows_custom_avatar(app, client, hash_password):
     """Original avatar test adapted to pytest: user has custom avatar path displayed."""
-    # Clear rate limiter state
-    from routes.auth_routes import _LOGIN_ATTEMPTS
-
-    _LOGIN_ATTEMPTS.clear()
-
-    # Create fresh app to avoid rate limiting
-    fresh_app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
-    client = fresh_app.test_client()
-
-    with fresh_app.app_context():
-        db.create_all()
+    with app.app_context():
         user = User(
             username="avatar_user",
             email="avatar@test.com",
-            password_hash=generate_password_hash("Test123!"),
+            password_hash=hash_password("Test123!"),
             avatar="uploads/test-avatar.png",
         )
         db.session.add(user)
@@ -103,10 +80,8 @@ def test_leaderboard_shows_custom_avatar():
         db.session.commit()
 
     # Login via form (not register to keep avatar pre-set)
-    login_resp = client.post(
-        "/login", data={"username": "avatar_user", "password": "Test123!"}, follow_redirects=True
-    )
-    assert login_resp.status_code == 200
+    login_resp = client.post("/login", data={"username": "avatar_user", "password": "Test123!"})
+    assert login_resp.status_code == 302
 
     res = client.get("/leaderboard")
     assert res.status_code == 200
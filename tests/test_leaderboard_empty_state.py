@@ -1,16 +1,3 @@
-import pytest
-
-from app import create_app, db
-
-
-@pytest.fixture
-def client():
-    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
-    with app.app_context():
-        db.create_all()
-        yield app.test_client()
-
-
 def register(client, username="empty_user", email="empty@test.com", password="Test123!"):
     return client.post(
         "/register",
@@ -20,14 +7,13 @@ def register(client, username="empty_user", email="empty@test.com", password="Te
             "password": password,
             "confirm_password": password,
         },
-        follow_redirects=True,
     )
 
 
 def test_global_leaderboard_empty_state_shown(client):
     # Register to satisfy login_required, but do not add any scores
     r = register(client)
-    assert r.status_code == 200
+    assert r.status_code == 302
 
     res = client.get("/leaderboard")
     assert res.status_code == 200
@@ -1,48 +1,42 @@
 """Tests for quiz route error handling and edge cases."""
 
-from unittest.mock import patch
-
 import pytest
-from werkzeug.security import generate_password_hash
 
-from app import create_app
 from models import User, db
 
 
 @pytest.fixture
-def app():
-    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
-    with app.app_context():
-        db.create_all()
-        yield app
-
+def logged_in_user(client, test_password_hash):
+    """Create and login a user."""
+    user = User(
+        username="quizuser",
+        email="quiz@test.com",
+        password_hash=test_password_hash,
+    )
+    db.session.add(user)
+    db.session.commit()
 
-@pytest.fixture
-def client(app):
-    return app.test_client()
+    response = client.post("/login", data={"username": "quizuser", "password": "Test123!"})
+    assert response.status_code == 302
+    return client
 
 
 @pytest.fixture
-def logged_in_user(client, app):
-    """Create and login a user."""
-    # Clear rate limiter state
-    from routes.auth_routes import _LOGIN_ATTEMPTS
-
-    _LOGIN_ATTEMPTS.clear()
-
-    with app.app_context():
-        user = User(
-            username="quizuser",
-            email="quiz@test.com",
-            password_hash=generate_password_hash("Test123!"),
+def stub_fetch(monkeypatch):
+    """Return a helper that makes TriviaService.fetch_questions_for_topics return or raise."""
+
+    def _stub_fetch(result):
+        def fetch_questions_for_topics(self, *args, **kwargs):
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        monkeypatch.setattr(
+            "routes.quiz_routes.TriviaService.fetch_questions_for_topics",
+            fetch_questions_for_topics,
         )
-        db.session.add(user)
-        db.session.commit()
 
-    client.post(
-        "/login", data={"username": "quizuser", "password": "Test123!"}, follow_redirects=True
-    )
-    return client
+    return _stub_fetch
 
 
 def test_quiz_with_empty_topics(client):
@@ -55,103 +49,81 @@ def test_quiz_with_empty_topics(client):
     assert b"select at least one topic" in response.data
 
 
-def test_quiz_logged_in_uses_authenticated_username(logged_in_user):
+def test_quiz_logged_in_uses_authenticated_username(logged_in_user, stub_fetch):
     """Test that logged-in user's username is used from current_user."""
-    with patch("routes.quiz_routes.TriviaService.fetch_questions_for_topics") as mock_fetch:
-        mock_fetch.return_value = [
+    stub_fetch(
+        [
             {"question": "Q1", "correct": "A", "options": ["A", "B", "C", "D"]},
             {"question": "Q2", "correct": "B", "options": ["A", "B", "C", "D"]},
         ]
-        response = logged_in_user.post(
-            "/quiz",
-            data={"username": "DifferentUser", "quiz_type": "Science & Nature"},
-            follow_redirects=True,
-        )
+    )
+    response = logged_in_user.post(
+        "/quiz",
+        data={"username": "DifferentUser", "quiz_type": "Science & Nature"},
+    )
 
-        assert response.status_code == 200
+    assert response.status_code == 302
 
-        # Session should have authenticated username
-        with logged_in_user.session_transaction() as sess:
-            username = sess.get("username")
-            assert username == "quizuser"
+    # Session should have authenticated username
+    with logged_in_user.session_transaction() as sess:
+        username = sess.get("username")
+        assert username == "quizuser"
 
 
-def test_quiz_service_exception_handling(client):
+def test_quiz_service_exception_handling(client, stub_fetch):
     """Test quiz route handles TriviaService exceptions."""
-    with patch("routes.quiz_routes.TriviaService.fetch_questions_for_topics") as mock_fetch:
-        mock_fetch.side_effect = Exception("API failure")
+    stub_fetch(Exception("API failure"))
 
-        response = client.post("/quiz", data={"username": "testuser", "quiz_type": "History"})
+    response = client.post("/quiz", data={"username": "testuser", "quiz_type": "History"})
 
-        assert response.status_code == 503
-        assert b"Unable to load quiz questions" in response.data
+    assert response.status_code == 503
+    assert b"Unable to load quiz questions" in response.data
 
 
-def test_quiz_empty_questions_response(client):
+def test_quiz_empty_questions_response(client, stub_fetch):
     """Test handling when API returns empty questions list."""
-    with patch("routes.quiz_routes.TriviaService.fetch_questions_for_topics") as mock_fetch:
-        mock_fetch.return_value = []
-
-        response = client.post("/quiz", data={"username": "testuser", "quiz_type": "Computers"})
-
-        assert response.status_code == 503
-        assert b"Unable to load quiz questions" in response.data
-
-
-def test_question_with_invalid_session_index(client):
-    """Test question route handles corrupted session index."""
-    with client.session_transaction() as sess:
-        sess["questions"] = [{"question": "Q1", "correct": "A", "options": ["A", "B", "C", "D"]}]
-        sess["current_index"] = 999  # Out of bounds
-
-    response = client.post("/question", data={"answer": "A"}, follow_redirects=True)
-
-    # Should redirect to result without crashing
-    assert response.status_code == 200
-
-
-def test_question_negative_index(client):
-    """Test question route handles negative index."""
-    with client.session_transaction() as sess:
-        sess["questions"] = [{"question": "Q1", "correct": "A", "options": ["A", "B", "C", "D"]}]
-        sess["current_index"] = -1
-
-    response = client.post("/question", data={"answer": "A"}, follow_redirects=True)
-
-    assert response.status_code == 200
-
-
-def test_question_post_increments_index(client):
-    """Test that answering a question increments the index."""
-    with client.session_transaction() as sess:
-        sess["username"] = "testuser"
-        sess["questions"] = [
-            {"question": "Q1", "correct": "A", "options": ["A", "B", "C", "D"]},
-            {"question": "Q2", "correct": "B", "options": ["A", "B", "C", "D"]},
-        ]
-        sess["current_index"] = 0
-        sess["score"] = 0
-
-    response = client.post("/question", data={"answer": "A"})
-
-    # Should move to next question
-    with client.session_transaction() as sess:
-        assert sess["current_index"] == 1
-        assert sess["score"] == 1  # Correct answer
-
-
-def test_question_incorrect_answer_no_score_change(client):
-    """Test that incorrect answer doesn't increment score."""
+    stub_fetch([])
+
+    response = client.post("/quiz", data={"username": "testuser", "quiz_type": "Computers"})
+
+    assert response.status_code == 503
+    assert b"Unable to load quiz questions" in response.data
+
+
+_TWO_QUESTIONS = [
+    {"question": "Q1", "correct": "A", "options": ["A", "B", "C", "D"]},
+    {"question": "Q2", "correct": "B", "options": ["A", "B", "C", "D"]},
+]
+
+
+@pytest.mark.parametrize(
+    "index, answer, expect_status, expect_index, expect_score",
+    [
+        # Corrupted indexes redirect to the result page without crashing or scoring
+        pytest.param(999, "A", 302, 999, 0, id="out-of-bounds-index"),
+        pytest.param(-1, "A", 302, -1, 0, id="negative-index"),
+        # A correct answer scores and moves on to the next question
+        pytest.param(0, "A", 200, 1, 1, id="correct-answer"),
+        # A wrong answer advances without changing the score
+        pytest.param(0, "B", 200, 1, 0, id="incorrect-answer"),
+    ],
+)
+def test_question_answer_updates_session(
+    client, index, answer, expect_status, expect_index, expect_score
+):
+    """Test how answering updates the question index and score for each session state."""
     with client.session_transaction() as sess:
         sess["username"] = "testuser"
-        sess["questions"] = [{"question": "Q1", "correct": "A", "options": ["A", "B", "C", "D"]}]
-        sess["current_index"] = 0
+        sess["questions"] = _TWO_QUESTIONS
+        sess["current_index"] = index
         sess["score"] = 0
 
-    response = client.post("/question", data={"answer": "B"})  # Wrong answer
+    response = client.post("/question", data={"answer": answer})
 
+    assert response.status_code == expect_status
     with client.session_transaction() as sess:
-        assert sess["score"] == 0  # No points
+        assert sess["current_index"] == expect_index
+        assert sess["score"] == expect_score
 
 
 def test_question_get_shows_progress_bar(client):
@@ -173,47 +145,43 @@ def test_question_get_shows_progress_bar(client):
     assert "2" in html and "3" in html
 
 
-def test_quiz_multi_topic_selection(client):
+def test_quiz_multi_topic_selection(client, stub_fetch):
     """Test quiz creation with multiple topics."""
-    with patch("routes.quiz_routes.TriviaService.fetch_questions_for_topics") as mock_fetch:
-        mock_fetch.return_value = [
+    stub_fetch(
+        [
             {"question": "Q1", "correct": "A", "options": ["A", "B", "C", "D"]},
             {"question": "Q2", "correct": "B", "options": ["A", "B", "C", "D"]},
             {"question": "Q3", "correct": "C", "options": ["A", "B", "C", "D"]},
             {"question": "Q4", "correct": "D", "options": ["A", "B", "C", "D"]},
             {"question": "Q5", "correct": "A", "options": ["A", "B", "C", "D"]},
         ]
-        response = client.post(
-            "/quiz",
-            data={
-                "username": "testuser",
-                "topics": ["General Knowledge", "Science & Nature", "Computers"],
-            },
-            follow_redirects=True,
-        )
+    )
+    response = client.post(
+        "/quiz",
+        data={
+            "username": "testuser",
+            "topics": ["General Knowledge", "Science & Nature", "Computers"],
+        },
+    )
 
-        assert response.status_code == 200
+    assert response.status_code == 302
 
-        with client.session_transaction() as sess:
-            questions = sess.get("questions", [])
-            assert len(questions) == 5  # Should fetch 5 questions
-            # Category should be "Mixed Topics" for multiple selections
-            assert sess.get("quiz_category") in ["General Knowledge", "Mixed Topics"]
+    with client.session_transaction() as sess:
+        questions = sess.get("questions", [])
+        assert len(questions) == 5  # Should fetch 5 questions
+        # Category should be "Mixed Topics" for multiple selections
+        assert sess.get("quiz_category") in ["General Knowledge", "Mixed Topics"]
 
 
-def test_quiz_single_topic_category_name(client):
+def test_quiz_single_topic_category_name(client, stub_fetch):
     """Test that single topic uses its name as category."""
-    with patch("routes.quiz_routes.TriviaService.fetch_questions_for_topics") as mock_fetch:
-        mock_fetch.return_value = [
-            {"question": "Q1", "correct": "A", "options": ["A", "B", "C", "D"]},
-        ]
-        response = client.post(
-            "/quiz",
-            data={"username": "testuser", "topics": ["Mathematics"]},
-            follow_redirects=True,
-        )
+    stub_fetch([{"question": "Q1", "correct": "A", "options": ["A", "B", "C", "D"]}])
+    response = client.post(
+        "/quiz",
+        data={"username": "testuser", "topics": ["Mathematics"]},
+    )
 
-        assert response.status_code == 200
+    assert response.status_code == 302
 
-        with client.session_transaction() as sess:
-            assert sess.get("quiz_category") == "Mathematics"
+    with client.session_transaction() as sess:
+        assert sess.get("quiz_category") == "Mathematics"
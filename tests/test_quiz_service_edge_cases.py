@@ -1,9 +1,10 @@
 """Tests for quiz service caching, error handling, and edge cases."""
 
-import time
+import json
 from unittest.mock import Mock, patch
 
 import pytest
+import requests
 
 from services.quiz_service import _QUESTION_CACHE, TriviaService
 
@@ -16,73 +17,85 @@ def clear_cache():
     _QUESTION_CACHE.clear()
 
 
-def test_cache_hit():
-    """Test that second request for same topics uses cache."""
-    svc = TriviaService(retries=1)
+def _ok_response(results):
+    """Build a real 200 response carrying an OpenTDB-style JSON body."""
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps({"response_code": 0, "results": results}).encode()
+    return response
 
-    call_count = {"count": 0}
 
-    def mock_fetch(self, amount=1, category_id=None):
-        call_count["count"] += 1
-        return [
-            {
-                "question": "Test?",
-                "correct_answer": "A",
-                "incorrect_answers": ["B", "C", "D"],
-            }
-        ]
+_OK_RESPONSE = _ok_response(
+    [{"question": "Test%3F", "correct_answer": "A", "incorrect_answers": ["B", "C", "D"]}]
+)
 
-    with patch.object(TriviaService, "_fetch", mock_fetch):
-        # First call - should hit API
-        q1 = svc.fetch_questions_for_topics(["General Knowledge"], total_needed=5)
-        assert len(q1) > 0
-        assert call_count["count"] > 0
 
-        # Second call - should use cache
-        initial_count = call_count["count"]
-        q2 = svc.fetch_questions_for_topics(["General Knowledge"], total_needed=5)
-        assert len(q2) > 0
-        assert call_count["count"] == initial_count  # No additional API calls
+@pytest.fixture
+def api_calls(monkeypatch):
+    """Answer OpenTDB requests with one canned question and record each call's params.
+
+    Only requests.get is faked, so _fetch and the cache logic around it run for real.
+    """
+    calls = []
+
+    def fake_get(url, params=None, timeout=None):
+        calls.append(params)
+        return _OK_RESPONSE
+
+    monkeypatch.setattr("services.quiz_service.requests.get", fake_get)
+    return calls
+
+
+def test_cache_hit(api_calls):
+    """Test that second request for same topics uses cache."""
+    svc = TriviaService(retries=1)
+
+    # First call - should hit API
+    q1 = svc.fetch_questions_for_topics(["General Knowledge"], total_needed=5)
+    assert len(q1) > 0
+    assert len(api_calls) > 0
 
+    # Second call - should use cache
+    initial_count = len(api_calls)
+    q2 = svc.fetch_questions_for_topics(["General Knowledge"], total_needed=5)
+    assert len(q2) > 0
+    assert len(api_calls) == initial_count  # No additional API calls
 
-def test_cache_expiry():
+
+def test_cache_expiry(monkeypatch, api_calls):
     """Test that cache expires after TTL."""
-    import importlib
-    import os
+    from services import quiz_service
 
-    # Set very short cache TTL
-    with patch.dict(os.environ, {"QUIZ_CACHE_TTL": "1"}):
-        # Reload module to pick up new env var
-        from services import quiz_service
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(quiz_service, "_now", lambda: clock["now"])
+    # Set very short cache TTL; it is read on each lookup, so no reload is needed
+    monkeypatch.setenv("QUIZ_CACHE_TTL", "1")
+    svc = TriviaService(retries=1)
 
-        importlib.reload(quiz_service)
+    # First call
+    svc.fetch_questions_for_topics(["General Knowledge"], total_needed=5)
+    first_count = len(api_calls)
 
-        TriviaService = quiz_service.TriviaService
-        svc = TriviaService(retries=1)
+    # Advance the fake clock past the TTL instead of sleeping
+    clock["now"] += 2
 
-        call_count = {"count": 0}
+    # Second call should hit API again
+    svc.fetch_questions_for_topics(["General Knowledge"], total_needed=5)
+    assert len(api_calls) > first_count
 
-        def mock_fetch(self, amount=1, category_id=None):
-            call_count["count"] += 1
-            return [
-                {
-                    "question": "Test?",
-                    "correct_answer": "A",
-                    "incorrect_answers": ["B", "C", "D"],
-                }
-            ]
 
-        with patch.object(TriviaService, "_fetch", mock_fetch):
-            # First call
-            svc.fetch_questions_for_topics(["General Knowledge"], total_needed=5)
-            first_count = call_count["count"]
+def test_cache_is_bounded(monkeypatch, api_calls):
+    """Test that the cache evicts least recently used entries past its cap."""
+    from services import quiz_service
 
-            # Wait for cache to expire
-            time.sleep(1.5)
+    monkeypatch.setattr(quiz_service, "_CACHE_MAX_ENTRIES", 2)
+    svc = quiz_service.TriviaService(retries=1)
 
-            # Second call should hit API again
-            svc.fetch_questions_for_topics(["General Knowledge"], total_needed=5)
-            assert call_count["count"] > first_count
+    for total in (1, 2, 3):
+        svc.fetch_questions_for_topics(["General Knowledge"], total_needed=total)
+
+    assert len(quiz_service._QUESTION_CACHE) == 2
+    assert (("General Knowledge",), 1, None) not in quiz_service._QUESTION_CACHE
 
 
 def test_empty_topics_list():
@@ -149,47 +162,30 @@ def test_fallback_to_generic_when_category_fails():
         assert len(questions) == 5
 
 
-def test_fetch_with_custom_timeout():
-    """Test that custom timeout is used."""
-    import os
-
-    with patch.dict(os.environ, {"TRIVIA_TIMEOUT_SECONDS": "10"}):
-        # Reimport to pick up env var
-        import importlib
-
-        from services import quiz_service
-
-        importlib.reload(quiz_service)
-
-        svc = quiz_service.TriviaService()
-        assert svc.timeout == 10
-
-
-def test_fetch_with_custom_retries():
-    """Test that custom retry count is used."""
-    import os
-
-    with patch.dict(os.environ, {"TRIVIA_MAX_RETRIES": "5"}):
-        import importlib
-
-        from services import quiz_service
+def test_fetch_with_custom_timeout(monkeypatch):
+    """Test that the timeout is read from TRIVIA_TIMEOUT_SECONDS."""
+    monkeypatch.setenv("TRIVIA_TIMEOUT_SECONDS", "10")
+    svc = TriviaService()
+    assert svc.timeout == 10
 
-        importlib.reload(quiz_service)
 
-        svc = quiz_service.TriviaService()
-        assert svc.retries == 5
+def test_fetch_with_custom_retries(monkeypatch):
+    """Test that the retry count is read from TRIVIA_MAX_RETRIES."""
+    monkeypatch.setenv("TRIVIA_MAX_RETRIES", "5")
+    svc = TriviaService()
+    assert svc.retries == 5
 
 
-def test_html_unescaping():
-    """Test that HTML entities in questions are properly unescaped."""
+def test_url_decoding():
+    """Test that url3986-encoded questions from OpenTDB are properly decoded."""
     svc = TriviaService(retries=1)
 
     def mock_fetch(self, amount=1, category_id=None):
         return [
             {
-                "question": "What&#039;s 2 &amp; 2?",
-                "correct_answer": "Four &lt;4&gt;",
-                "incorrect_answers": ["One &quot;1&quot;", "Two", "Three"],
+                "question": "What%27s%202%20%26%202%3F",
+                "correct_answer": "Four%20%3C4%3E",
+                "incorrect_answers": ["One%20%221%22", "Two", "Three"],
             }
         ]
 
@@ -198,7 +194,7 @@ def test_html_unescaping():
 
         assert questions[0]["question"] == "What's 2 & 2?"
         assert questions[0]["correct"] == "Four <4>"
-        # Options should include unescaped text
+        # Options should include decoded text
         assert any('One "1"' in opt for opt in questions[0]["options"])
 
 
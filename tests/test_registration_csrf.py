@@ -1,27 +1,23 @@
-import re
+_CSRF_MARKER = b'name="csrf_token" value="'
 
-import pytest
 
-from app import create_app, db
+def _extract_csrf(html: bytes) -> str | None:
+    # Fixed markup from register.html, so a plain substring scan is enough
+    start = html.find(_CSRF_MARKER)
+    if start < 0:
+        return None
+    start += len(_CSRF_MARKER)
+    return html[start : html.find(b'"', start)].decode() or None
 
 
-def _extract_csrf(html: str) -> str | None:
-    m = re.search(r'name="csrf_token"\s+value="([^"]+)"', html)
-    return m.group(1) if m else None
-
-
-def test_registration_with_csrf_enabled():
-    # Create app with CSRF enabled (no TESTING override)
-    app = create_app()
+def test_registration_with_csrf_enabled(csrf_app):
+    app = csrf_app
     client = app.test_client()
 
-    with app.app_context():
-        db.create_all()
-
     # GET register to obtain CSRF token
     get_resp = client.get("/register")
     assert get_resp.status_code == 200
-    token = _extract_csrf(get_resp.get_data(as_text=True))
+    token = _extract_csrf(get_resp.get_data())
     assert token, "csrf_token not found in register form"
 
     # POST valid registration payload
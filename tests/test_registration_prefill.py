@@ -1,24 +1,20 @@
 import re
 
-import pytest
+_VALUE_PATTERNS: dict[str, re.Pattern[str]] = {}
 
-from app import create_app, db
+
+def _value_pattern(field: str) -> re.Pattern[str]:
+    pattern = _VALUE_PATTERNS.get(field)
+    if pattern is None:
+        pattern = _VALUE_PATTERNS[field] = re.compile(rf'id="{field}"[^>]*value="([^"]*)"')
+    return pattern
 
 
 def extract_value(html: str, field: str) -> str | None:
-    pattern = rf'id="{field}"[^>]*value="([^"]*)"'
-    m = re.search(pattern, html)
+    m = _value_pattern(field).search(html)
     return m.group(1) if m else None
 
 
-@pytest.fixture
-def client():
-    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
-    with app.app_context():
-        db.create_all()
-    return app.test_client()
-
-
 def test_registration_prefills_on_username_length_error(client):
     # First POST with invalid short username
     resp = client.post(
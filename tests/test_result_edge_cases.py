@@ -1,40 +1,24 @@
 """Tests for result page error handling and edge cases."""
 
 import pytest
-from werkzeug.security import generate_password_hash
+from sqlalchemy import event
 
-from app import create_app
 from models import Score, User, db
 
 
 @pytest.fixture
-def app():
-    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"})
-    with app.app_context():
-        db.create_all()
-        yield app
-
-
-@pytest.fixture
-def client(app):
-    return app.test_client()
-
-
-@pytest.fixture
-def logged_in_user(client, app):
+def logged_in_user(client, test_password_hash):
     """Create and login a user."""
-    with app.app_context():
-        user = User(
-            username="resultuser",
-            email="result@test.com",
-            password_hash=generate_password_hash("Test123!"),
-        )
-        db.session.add(user)
-        db.session.commit()
-
-    client.post(
-        "/login", data={"username": "resultuser", "password": "Test123!"}, follow_redirects=True
+    user = User(
+        username="resultuser",
+        email="result@test.com",
+        password_hash=test_password_hash,
     )
+    db.session.add(user)
+    db.session.commit()
+
+    response = client.post("/login", data={"username": "resultuser", "password": "Test123!"})
+    assert response.status_code == 302
     return client
 
 
@@ -80,23 +64,28 @@ def test_result_with_score_exceeding_total(logged_in_user):
     # Score should be clamped to 5 (total)
 
 
-def test_result_database_error_still_displays(logged_in_user, app):
+def test_result_database_error_still_displays(logged_in_user):
     """Test that result page displays even if database save fails."""
-    from unittest.mock import patch
-
     with logged_in_user.session_transaction() as sess:
         sess["username"] = "resultuser"
         sess["score"] = 3
         sess["questions"] = [{"q": "test"}] * 5
         sess["quiz_category"] = "Test"
 
-    # Mock db.session.commit to raise an error
-    with patch.object(db.session, "commit", side_effect=Exception("DB error")):
+    # Fail every commit at the session's transaction boundary
+    def _fail_commit(session):
+        raise Exception("DB error")
+
+    event.listen(db.session, "before_commit", _fail_commit)
+    try:
         response = logged_in_user.get("/result")
+    finally:
+        event.remove(db.session, "before_commit", _fail_commit)
 
     # Should still return 200 and display result
     assert response.status_code == 200
     assert b"3" in response.data
+    assert Score.query.count() == 0
 
 
 def test_result_cleans_session_after_display(logged_in_user):
@@ -132,33 +121,29 @@ def test_result_without_login_shows_form_username(client):
     assert b"GuestUser" in response.data
 
 
-def test_result_score_not_duplicated_on_refresh(logged_in_user, app):
+def test_result_score_not_duplicated_on_refresh(logged_in_user):
     """Test that refreshing result page doesn't create duplicate score."""
     # Start and complete a quiz
-    logged_in_user.post("/quiz", data={"quiz_type": "Math"}, follow_redirects=True)
+    logged_in_user.post("/quiz", data={"quiz_type": "Math"})
 
-    # Complete questions
-    for _ in range(5):
-        with logged_in_user.session_transaction() as sess:
-            idx = sess.get("current_index", 0)
-            questions = sess.get("questions", [])
-            if idx < len(questions):
-                correct = questions[idx]["correct"]
-                logged_in_user.post("/question", data={"answer": correct})
+    # Complete questions; read them once since each POST just advances the index
+    with logged_in_user.session_transaction() as sess:
+        questions = sess["questions"]
+    for question in questions:
+        logged_in_user.post("/question", data={"answer": question["correct"]})
 
     # Visit result page
     logged_in_user.get("/result")
 
     # Refresh by visiting again (should redirect to index since session cleared)
-    response = logged_in_user.get("/result", follow_redirects=True)
-    assert response.status_code == 200
+    response = logged_in_user.get("/result")
+    assert response.status_code == 302
 
     # Check database has only one score
-    with app.app_context():
-        user = User.query.filter_by(username="resultuser").first()
-        scores = Score.query.filter_by(user_id=user.id).all()
-        # Should have at most 1 score
-        assert len(scores) <= 1
+    user = User.query.filter_by(username="resultuser").first()
+    scores = Score.query.filter_by(user_id=user.id).all()
+    # Should have at most 1 score
+    assert len(scores) <= 1
 
 
 def test_result_with_missing_category(logged_in_user):
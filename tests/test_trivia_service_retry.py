@@ -6,6 +6,8 @@ from services.quiz_service import TriviaService
 
 
 class DummyResponse:
+    __slots__ = ("_json", "status_code")
+
     def __init__(self, json_data, status_code=200):
         self._json = json_data
         self.status_code = status_code
@@ -18,6 +20,19 @@ class DummyResponse:
         return self._json
 
 
+_OK_RESPONSE = DummyResponse(
+    {
+        "results": [
+            {
+                "question": "Test Q?",
+                "correct_answer": "A",
+                "incorrect_answers": ["B", "C", "D"],
+            }
+        ]
+    }
+)
+
+
 def test_fetch_retry_success(monkeypatch):
     """Ensure _fetch retries after initial failures and succeeds on later attempt."""
     attempts = {"count": 0}
@@ -27,17 +42,7 @@ def test_fetch_retry_success(monkeypatch):
         # Fail first two attempts, succeed on third
         if attempts["count"] < 3:
             raise Exception("network error")
-        return DummyResponse(
-            {
-                "results": [
-                    {
-                        "question": "Test Q?",
-                        "correct_answer": "A",
-                        "incorrect_answers": ["B", "C", "D"],
-                    }
-                ]
-            }
-        )
+        return _OK_RESPONSE
 
     monkeypatch.setattr("services.quiz_service.requests.get", fake_get)
 
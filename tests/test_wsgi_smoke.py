@@ -1,5 +1,13 @@
-def test_wsgi_imports_app():
-    import importlib
+import importlib
 
-    wsgi = importlib.import_module("wsgi")
-    assert hasattr(wsgi, "app") and wsgi.app is not None
+import pytest
+
+
+@pytest.fixture(scope="session")
+def wsgi_mod():
+    """Import the WSGI entry point once; importing it builds the production app."""
+    return importlib.import_module("wsgi")
+
+
+def test_wsgi_imports_app(wsgi_mod):
+    assert hasattr(wsgi_mod, "app") and wsgi_mod.app is not None